@@ -0,0 +1,76 @@
+"""Micro-benchmark the precompiled extension and focus-path filters against linear scans.
+
+Usage: python benchmarks/bench_filters.py [--extensions 5 50 200] [--focus 5 50 200] [--names 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fw.filters import compile_suffix_matcher, config_path_prefixes
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_extensions(count: int, names: list, repeat: int):
+    rng = random.Random(count)
+    extensions = [f".x{i}" for i in range(count - 2)] + [".py", ".d.ts"]
+    rng.shuffle(extensions)
+    matcher = compile_suffix_matcher(extensions)
+    suffixes = tuple(extensions)
+
+    linear = lambda: [any(n.endswith(ext) for ext in extensions) for n in names]
+    tupled = lambda: [n.endswith(suffixes) for n in names]
+    indexed = lambda: [matcher(n) for n in names]
+    if not linear() == tupled() == indexed():
+        print("ERROR: extension filters disagree")
+        sys.exit(1)
+    return best_of(linear, repeat), best_of(tupled, repeat), best_of(indexed, repeat)
+
+def bench_focus(count: int, rel_paths: list, repeat: int):
+    config_paths = {os.path.join("services", f"svc_{i}", "src") for i in range(count)}
+    prefixes = config_path_prefixes(config_paths)
+
+    linear = lambda: [any(cp.startswith(r + os.sep) for cp in config_paths) for r in rel_paths]
+    indexed = lambda: [r in prefixes for r in rel_paths]
+    if linear() != indexed():
+        print("ERROR: focus path filters disagree")
+        sys.exit(1)
+    return best_of(linear, repeat), best_of(indexed, repeat)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--extensions", type=int, nargs="+", default=[5, 50, 200])
+    parser.add_argument("--focus", type=int, nargs="+", default=[5, 50, 200])
+    parser.add_argument("--names", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pool = [".py", ".d.ts", ".ts", ".md", ".bin", ".x3", ""]
+    names = [f"file_{i}{rng.choice(pool)}" for i in range(args.names)]
+    rel_paths = [os.path.join("services", f"svc_{rng.randrange(400)}" + rng.choice(["", "0"]), rng.choice(["", "src", "docs"])).rstrip(os.sep)
+                 for _ in range(args.names)]
+
+    print(f"{'extensions':>10}{'any()':>12}{'tuple':>12}{'index':>12}{'vs any':>10}")
+    for count in args.extensions:
+        linear, tupled, indexed = bench_extensions(count, names, args.repeat)
+        print(f"{count:>10}{linear:>12.4f}{tupled:>12.4f}{indexed:>12.4f}{linear / indexed:>9.1f}x")
+
+    print(f"\n{'focus':>10}{'any()':>12}{'index':>12}{'speedup':>10}")
+    for count in args.focus:
+        linear, indexed = bench_focus(count, rel_paths, args.repeat)
+        print(f"{count:>10}{linear:>12.4f}{indexed:>12.4f}{linear / indexed:>9.1f}x")
+    print(f"\n{args.names} names per run, identical results for every filter")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark the git-index tree backend against the scandir walker on a synthetic repository.
+
+Needs the git CLI to create the repository's index.
+
+Usage: python benchmarks/bench_git_index.py [--depth 4] [--fanout 6] [--files 20]
+"""
+import argparse
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_tree import CONFIG, measure
+from synthetic import build_tree
+from fw import git_index
+from fw.project_tree_generator import ProjectTreeGenerator
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=6)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--max-depth", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "project"
+        build_tree(root / "src", args.depth, args.fanout, args.files)
+        subprocess.run(["git", "init", "-q", str(root)], check=True)
+        subprocess.run(["git", "-C", str(root), "add", "-A"], check=True)
+        focus = root / "src"
+
+        def walk(config):
+            return ProjectTreeGenerator(root, root, config).generate_tree(focus, args.max_depth)
+
+        def cold(config):
+            git_index._index_memo.clear()
+            return walk(config)
+
+        git_config = dict(CONFIG, tree_backend="git")
+        untracked_config = dict(git_config, git_untracked=True)
+        runs = [
+            ("scandir", *measure(lambda: walk(CONFIG), args.repeat)),
+            ("git cold", *measure(lambda: cold(git_config), args.repeat)),
+            ("git warm", *measure(lambda: walk(git_config), args.repeat)),
+            ("git+untr", *measure(lambda: walk(untracked_config), args.repeat)),
+        ]
+
+    if any(lines != runs[0][1] for _, lines, _, _ in runs):
+        print("ERROR: git index output differs from the scandir walker")
+        sys.exit(1)
+
+    scandir_time = runs[0][2]
+    print(f"{'backend':<10}{'lines':>10}{'seconds':>12}{'syscalls':>12}{'speedup':>10}")
+    for label, lines, seconds, calls in runs:
+        print(f"{label:<10}{len(lines):>10}{seconds:>12.4f}{sum(calls.values()):>12}"
+              f"{scandir_time / seconds:>9.2f}x  {calls}")
+    print("identical output: yes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark the multi-project scheduler: concurrency cap, skipped cycles and backoff of idle projects.
+
+Schedules synthetic projects on short intervals, samples the number of
+scans running at once, and changes one project halfway through to check
+that its backoff resets while the idle ones keep slowing down.
+
+Usage: python benchmarks/bench_scheduler.py [--projects 12] [--seconds 10] [--max-concurrent 2]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic import build_repo, make_spec
+from fw.daemon import Daemon
+from fw.scheduler import Scheduler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--projects", type=int, default=12)
+    parser.add_argument("--preset", default="small")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--interval", type=float, default=0.5, help="Seconds between runs of each project")
+    parser.add_argument("--max-concurrent", type=int, default=2)
+    parser.add_argument("--max-backoff", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        roots = [Path(tmp) / f"project_{i}" for i in range(args.projects)]
+        for i, root in enumerate(roots):
+            build_repo(root, make_spec(args.preset, seed=i))
+            (root / "config.yaml").write_text("tree_focus:\n" + "".join(
+                f"  - focus_{n}\n" for n in range(make_spec(args.preset)["focus_dirs"])))
+
+        scheduler = Scheduler(Daemon(), args.max_concurrent, max_backoff=args.max_backoff)
+        for i, root in enumerate(roots):
+            # The first project outranks the rest
+            scheduler.add(str(root), args.interval / 60, priority=1 if i == 0 else 0)
+        scheduler.start()
+
+        peak = samples = busy = 0
+        changed = roots[-1]
+        started = time.monotonic()
+        halfway = False
+        while time.monotonic() - started < args.seconds:
+            active = scheduler.active
+            peak = max(peak, active)
+            busy += active
+            samples += 1
+            if not halfway and time.monotonic() - started >= args.seconds / 2:
+                halfway = True
+                (changed / "focus_0" / "new_module.py").touch()
+            time.sleep(0.005)
+        scheduler.stop()
+        while scheduler.active:
+            time.sleep(0.01)
+        report = scheduler.as_dict()
+
+    projects = {Path(p["project"]).name: p for p in report["projects"]}
+    print(f"{'project':<14}{'runs':>6}{'skipped':>9}{'backoff':>9}{'failures':>10}")
+    for name, p in projects.items():
+        print(f"{name:<14}{p['runs']:>6}{p['skipped']:>9}{p['backoff']:>9}{p['failures']:>10}")
+    runs = sum(p["runs"] for p in projects.values())
+    unbounded = args.projects * args.seconds / args.interval
+    print(f"{runs} scans in {args.seconds:.0f}s ({unbounded:.0f} at a fixed interval without backoff), "
+          f"peak {peak} at once (cap {args.max_concurrent}), {busy / max(samples, 1):.2f} on average")
+
+    failed = False
+    if peak > args.max_concurrent:
+        print("ERROR: more scans ran at once than the cap allows")
+        failed = True
+    if any(p["failures"] for p in projects.values()):
+        print("ERROR: scheduled scans failed")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Guard the fw CLI's startup cost using ``python -X importtime``.
+
+Imports fw.cli in a fresh interpreter, checks that modules reserved for
+specific commands (the interactive UI, the watcher, the batch process pool,
+yaml) are not loaded up front and that FlowWizard's own import time, i.e.
+everything below ``fw.cli`` except the typer/rich/click stack it cannot run
+without, stays within budget. Exits with status 1 when either check fails.
+
+Usage: python benchmarks/bench_startup.py [--budget-ms 25] [--repeat 5]
+"""
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must only load once the command that needs them runs
+DEFERRED_MODULES = (
+    "questionary",
+    "prompt_toolkit",
+    "yaml",
+    "ctypes",
+    "concurrent.futures.process",
+    "fw.batch",
+    "fw.daemon",
+    "fw.scheduler",
+    "fw.client",
+    "socketserver",
+    "fw.summaries",
+    "sqlite3",
+    "fw.watcher",
+    "fw.config_loader",
+    "fw.project_tree_generator",
+)
+# Needed to parse the command line at all
+FRAMEWORK_PACKAGES = ("typer", "click", "rich")
+# Milliseconds of fw.cli's own import time
+DEFAULT_BUDGET_MS = 25.0
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def import_profile(statement: str) -> list:
+    """``(name, depth, self_us, cumulative_us)`` for every module imported by ``statement``."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            modules.append((m.group(4), (len(m.group(3)) - 1) // 2, int(m.group(1)), int(m.group(2))))
+    return modules
+
+def own_cost_us(modules: list, target: str) -> int:
+    """Cumulative import time of ``target`` minus that of the framework packages it pulls in.
+
+    Children are printed before their parent, so the direct children of
+    ``target`` are the depth+1 entries right before it.
+    """
+    for pos, (name, depth, _, cumulative) in enumerate(modules):
+        if name != target:
+            continue
+        framework = 0
+        for child, child_depth, _, child_cumulative in reversed(modules[:pos]):
+            if child_depth <= depth:
+                break
+            if child_depth == depth + 1 and child.split(".")[0] in FRAMEWORK_PACKAGES:
+                framework += child_cumulative
+        return cumulative - framework
+    raise RuntimeError(f"{target} was not imported")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Maximum import time of fw.cli excluding typer, click and rich")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    best_own = best_total = None
+    for _ in range(args.repeat):
+        modules = import_profile("import fw.cli")
+        own = own_cost_us(modules, "fw.cli")
+        total = next(cumulative for name, _, _, cumulative in modules if name == "fw.cli")
+        best_own = own if best_own is None else min(best_own, own)
+        best_total = total if best_total is None else min(best_total, total)
+
+    loaded = {name for name, _, _, _ in modules}
+    early = [name for name in DEFERRED_MODULES if name in loaded]
+
+    print(f"import fw.cli: {best_total / 1000:.1f} ms total, "
+          f"{best_own / 1000:.1f} ms excluding {'/'.join(FRAMEWORK_PACKAGES)} (budget {args.budget_ms:.0f} ms)")
+    failed = False
+    if early:
+        print(f"FAIL: loaded at startup: {', '.join(early)}")
+        failed = True
+    if best_own / 1000 > args.budget_ms:
+        print("FAIL: startup over budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("ok")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark file summarization: in-process, on the process pool, and from the SQLite cache.
+
+Usage: python benchmarks/bench_summaries.py [--files 2000] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fw.summaries import SummaryCache, Summarizer
+from fw.tree_model import TreeRecorder
+
+MODULE = '''"""Synthetic module {i}."""
+import os
+
+LIMIT_{i} = {i}
+
+class Service{i}:
+    def run(self, value):
+        return [v * 2 for v in range(value) if v % 3]
+
+def helper_{i}(path):
+    with open(path) as f:
+        return f.read()
+
+async def fetch_{i}():
+    return None
+'''
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        keys = [f"src/mod_{i}.py" for i in range(args.files)]
+        (root / "src").mkdir()
+        old = time.time() - 3600
+        for i, key in enumerate(keys):
+            (root / key).write_text(MODULE.format(i=i))
+            # Outside the racy window, so the summaries are cached
+            os.utime(root / key, (old, old))
+
+        recorder = TreeRecorder()
+        inline = Summarizer(root, recorder, workers=1)
+        pooled = Summarizer(root, recorder, SummaryCache(root / "summaries.sqlite"), workers=args.workers)
+        try:
+            expected, inline_time = timed(lambda: inline.summarize(keys))
+            pooled_result, pool_time = timed(lambda: pooled.summarize(keys))
+            cached_result, cached_time = timed(lambda: pooled.summarize(keys))
+        finally:
+            inline.close()
+            pooled.close()
+
+    if not expected == pooled_result == cached_result:
+        print("ERROR: summaries differ between runs")
+        sys.exit(1)
+
+    print(f"{'run':<22}{'seconds':>10}{'files/s':>12}")
+    for label, seconds in (("in-process", inline_time), (f"pool ({args.workers} workers)", pool_time),
+                           ("cached", cached_time)):
+        print(f"{label:<22}{seconds:>10.4f}{args.files / seconds:>12.0f}")
+    print(f"{args.files} files, identical summaries for every run")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark the scandir tree walker against the original pathlib walker.
+
+Usage: python benchmarks/bench_tree.py [--depth 4] [--fanout 6] [--files 20]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from suite import count_syscalls
+from synthetic import build_tree
+from fw.project_tree_generator import ProjectTreeGenerator
+
+CONFIG = {
+    "include_extensions": [".py", ".md", ".json"],
+    "exclude_dirs": ["node_modules", "__pycache__", ".git"],
+}
+
+def legacy_generate_tree(generator, directory: Path, max_depth: int = 3, config_paths: set = None):
+    """The pathlib-based walker used before the scandir engine."""
+    tree_lines = []
+
+    def _generate(dir_path: Path, prefix: str = "", depth: int = 0):
+        if depth > max_depth:
+            return
+
+        items = sorted(list(dir_path.iterdir()), key=lambda x: (not x.is_file(), x.name))
+        for i, item in enumerate(items):
+            rel_path = str(item.relative_to(generator.project_root))
+            if item.is_dir():
+                if item.name in generator.exclude_dirs or generator.matches(str(item)):
+                    continue
+                if config_paths and any(cp.startswith(rel_path) for cp in config_paths if cp != rel_path):
+                    continue
+                is_last = i == len(items) - 1
+                tree_lines.append(f"{prefix}{'└── ' if is_last else '├── '}{item.name}/")
+                _generate(item, prefix + ("    " if is_last else "│   "), depth + 1)
+            else:
+                if any(item.name.endswith(ext) for ext in generator.include_extensions):
+                    is_last = i == len(items) - 1
+                    tree_lines.append(f"{prefix}{'└── ' if is_last else '├── '}{item.name}")
+
+    _generate(directory)
+    return tree_lines
+
+def measure(func, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    counts = {}
+    with count_syscalls(counts):
+        func()
+    return result, best, counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=6)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--max-depth", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "project"
+        build_tree(root / "src", args.depth, args.fanout, args.files)
+        generator = ProjectTreeGenerator(root, root, CONFIG)
+        focus = root / "src"
+
+        old_lines, old_time, old_calls = measure(
+            lambda: legacy_generate_tree(generator, focus, args.max_depth), args.repeat)
+        # A generator lists each directory once, so every run needs a fresh one
+        new_lines, new_time, new_calls = measure(
+            lambda: ProjectTreeGenerator(root, root, CONFIG).generate_tree(focus, args.max_depth), args.repeat)
+
+    if old_lines != new_lines:
+        print("ERROR: scandir output differs from the legacy walker")
+        sys.exit(1)
+
+    print(f"{'walker':<10}{'lines':>10}{'seconds':>12}{'syscalls':>12}")
+    for label, lines, seconds, calls in (("pathlib", old_lines, old_time, old_calls),
+                                         ("scandir", new_lines, new_time, new_calls)):
+        print(f"{label:<10}{len(lines):>10}{seconds:>12.4f}{sum(calls.values()):>12}  {calls}")
+    print(f"speedup: {old_time / new_time:.2f}x, identical output: yes")
+
+if __name__ == "__main__":
+    main()
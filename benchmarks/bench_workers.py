@@ -0,0 +1,105 @@
+"""Benchmark the agent pipeline across worker counts, over several focus directories and over one large one.
+
+The first case spreads the walk over ``--focus`` focus directories; the
+second puts a deeper tree under a single focus directory, walked whole
+with the output budget off, which only scales through the fan-out over
+its subdirectories. Every run's agent
+files must be byte-identical to the serial run. ``--latency-ms`` adds a
+delay to every ``os.scandir`` call, like a network filesystem would.
+
+Usage: python benchmarks/bench_workers.py [--focus 4] [--depth 4] [--fanout 6] [--files 20] [--large-depth 5]
+                                          [--latency-ms 0]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_tree import CONFIG
+from synthetic import build_tree
+from fw.pipeline import run_agent_pipeline
+from fw.project_tree_generator import ProjectTreeGenerator
+
+@contextmanager
+def scandir_latency(seconds: float):
+    """Delay every ``os.scandir`` call by ``seconds``; sleeping releases the GIL like real I/O does."""
+    original = os.scandir
+    if seconds <= 0:
+        yield
+        return
+
+    def _slow(*args, **kwargs):
+        time.sleep(seconds)
+        return original(*args, **kwargs)
+
+    os.scandir = _slow
+    try:
+        yield
+    finally:
+        os.scandir = original
+
+def run_case(label: str, root: Path, config: dict, focus_dirs: list, max_depth: int, workers_list: list,
+             repeat: int):
+    """Time the pipeline at every worker count, exiting if any output differs from the first (serial) run."""
+    out_dir = root.parent / f"out_{label.replace(' ', '_')}"
+    out_dir.mkdir()
+    baseline = None
+    print(f"{label}:")
+    print(f"{'workers':>8}{'seconds':>12}{'speedup':>10}")
+    for workers in workers_list:
+        best = float("inf")
+        for _ in range(repeat):
+            for f in out_dir.iterdir():
+                f.unlink()
+            # A generator lists each directory once, so every run needs a fresh one
+            generator = ProjectTreeGenerator(root, root, config)
+            start = time.perf_counter()
+            trees = generator.generate_focus_trees(focus_dirs, max_depth)
+            agents = run_agent_pipeline(out_dir, list(trees), trees, workers=workers)
+            best = min(best, time.perf_counter() - start)
+        # The agent files of the last run, to compare across worker counts
+        output = [(out_dir / name).read_bytes() for name in sorted(agents)]
+        if baseline is None:
+            baseline = (output, best)
+        elif output != baseline[0]:
+            print(f"ERROR: {label} output with {workers} workers differs from the {workers_list[0]}-worker run")
+            sys.exit(1)
+        print(f"{workers:>8}{best:>12.4f}{baseline[1] / best:>9.2f}x")
+    lines = sum(len(agent.splitlines()) for agent in baseline[0])
+    print(f"{lines} agent lines across {len(focus_dirs)} focus directories, byte-identical for every worker count\n")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--focus", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=6)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--large-depth", type=int, default=5, help="Depth of the single large focus directory")
+    parser.add_argument("--max-depth", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every os.scandir call")
+    args = parser.parse_args()
+    workers_list = sorted(set(args.workers) | {1})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        many = Path(tmp) / "many" / "project"
+        focus_dirs = [many / f"focus_{i}" for i in range(args.focus)]
+        for focus in focus_dirs:
+            build_tree(focus, args.depth, args.fanout, args.files)
+        large = Path(tmp) / "large" / "project"
+        build_tree(large / "focus", args.large_depth, args.fanout, args.files)
+
+        with scandir_latency(args.latency_ms / 1000):
+            run_case("several focus directories", many, CONFIG, focus_dirs, args.max_depth, workers_list,
+                     args.repeat)
+            run_case("one large focus directory", large, dict(CONFIG, max_tree_bytes=0), [large / "focus"],
+                     args.large_depth, workers_list, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Benchmark suite for the FlowWizard scan pipeline.
+
+Builds a synthetic repository and times each stage separately:
+detect_project_types, load_config (cold and cached),
+ProjectTreeGenerator.generate_tree and run_agent_pipeline. For every stage it reports the best wall time, the
+filesystem calls made and the peak Python memory, and it can save the
+results as a JSON baseline or compare against one.
+
+Usage:
+    python benchmarks/suite.py --preset medium --save baseline.json
+    python benchmarks/suite.py --preset medium --compare baseline.json
+"""
+import argparse
+import builtins
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic import PRESETS, build_repo, make_spec
+from fw.config_loader import detect_project_types, load_config
+from fw.pipeline import run_agent_pipeline
+from fw.project_tree_generator import ProjectTreeGenerator
+
+BASELINE_VERSION = 1
+COUNTED_OS_CALLS = ("stat", "lstat", "scandir", "listdir", "replace", "unlink")
+
+@contextmanager
+def count_syscalls(counts: dict):
+    """Count calls to the ``os`` functions and ``open`` that hit the filesystem."""
+    originals = {name: getattr(os, name) for name in COUNTED_OS_CALLS}
+    original_open = builtins.open
+
+    def _wrap(name, func):
+        def _counted(*args, **kwargs):
+            counts[name] = counts.get(name, 0) + 1
+            return func(*args, **kwargs)
+        return _counted
+
+    for name, func in originals.items():
+        setattr(os, name, _wrap(name, func))
+    builtins.open = _wrap("open", original_open)
+    try:
+        yield counts
+    finally:
+        for name, func in originals.items():
+            setattr(os, name, func)
+        builtins.open = original_open
+
+def measure(func, repeat: int = 3) -> dict:
+    """Best-of-``repeat`` wall time, then one counted run and one traced run."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    counts = {}
+    with count_syscalls(counts):
+        func()
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": round(best, 6),
+        "syscalls": sum(counts.values()),
+        "syscalls_by_call": dict(sorted(counts.items())),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+def run_suite(spec: dict, repeat: int = 5) -> dict:
+    with tempfile.TemporaryDirectory(prefix="fw-bench-") as tmp:
+        # Keep the config cache out of the user's cache directory
+        os.environ["XDG_CACHE_HOME"] = str(Path(tmp) / "cache")
+        root = Path(tmp) / "repo"
+        repo_stats = build_repo(root, spec)
+        config_file = root / "config.yaml"
+        focus = [f"focus_{i}" for i in range(spec["focus_dirs"])]
+        config_file.write_text("tree_focus:\n" + "".join(f"  - {f}\n" for f in focus) +
+                               f"max_depth: {spec['depth']}\nmax_entries_per_dir: 0\nmax_tree_bytes: 0\n")
+        # Age the config and project directory past the caches' racy window
+        aged = time.time() - 60
+        for path in (config_file, root):
+            os.utime(path, (aged, aged))
+        out_dir = Path(tmp) / "out"
+        out_dir.mkdir()
+
+        config = load_config(config_file, root, cache=False)
+        generator = ProjectTreeGenerator(root, root, config)
+        focus_dirs = generator.find_focus_dirs(root, config["tree_focus"])
+        trees = {str(d.relative_to(root)): generator.generate_tree(d, config["max_depth"]) for d in focus_dirs}
+
+        def tree_stage():
+            gen = ProjectTreeGenerator(root, root, config)
+            for d in focus_dirs:
+                gen.generate_tree(d, config["max_depth"])
+
+        def agent_stage():
+            # Fresh output directory each time so every run writes every file
+            for f in out_dir.iterdir():
+                f.unlink()
+            run_agent_pipeline(out_dir, list(trees), trees)
+
+        stages = {
+            "detect_project_types": measure(lambda: detect_project_types(root), repeat),
+            "load_config": measure(lambda: load_config(config_file, root, cache=False), repeat),
+            "load_config_cached": measure(lambda: load_config(config_file, root), repeat),
+            "generate_tree": measure(tree_stage, repeat),
+            "run_agent_pipeline": measure(agent_stage, repeat),
+        }
+
+    return {
+        "version": BASELINE_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "spec": spec,
+        "repo": dict(repo_stats, tree_lines=sum(len(t) for t in trees.values())),
+        "stages": stages,
+    }
+
+def compare(current: dict, baseline: dict, threshold: float, min_seconds: float = 0.005) -> list:
+    """Return ``(stage, metric, old, new, ratio)`` for every metric that regressed past ``threshold``.
+
+    Timings below ``min_seconds`` are too noisy to compare and are skipped.
+    """
+    regressions = []
+    for stage, result in current["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old:
+            continue
+        for metric in ("seconds", "syscalls", "peak_kib"):
+            if metric == "seconds" and max(old[metric], result[metric]) < min_seconds:
+                continue
+            if old[metric] and result[metric] / old[metric] > threshold:
+                regressions.append((stage, metric, old[metric], result[metric], result[metric] / old[metric]))
+    return regressions
+
+def print_report(result: dict, baseline: dict = None):
+    repo = result["repo"]
+    print(f"repo: {repo['dirs']} dirs, {repo['files']} files, {repo['ignored_dirs']} ignored dirs, "
+          f"{repo['gitignores']} .gitignore files, {repo['tree_lines']} tree lines")
+    header = f"{'stage':<24}{'seconds':>12}{'syscalls':>10}{'peak KiB':>10}"
+    if baseline:
+        header += f"{'vs base':>10}"
+    print(header)
+    for stage, r in result["stages"].items():
+        line = f"{stage:<24}{r['seconds']:>12.5f}{r['syscalls']:>10}{r['peak_kib']:>10.1f}"
+        old = (baseline or {}).get("stages", {}).get(stage)
+        if old and old["seconds"]:
+            line += f"{r['seconds'] / old['seconds']:>9.2f}x"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the FlowWizard scan pipeline.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default=None)
+    parser.add_argument("--focus-dirs", type=int)
+    parser.add_argument("--depth", type=int)
+    parser.add_argument("--fanout", type=int)
+    parser.add_argument("--files", type=int, help="Files per directory")
+    parser.add_argument("--ignore-density", type=float)
+    parser.add_argument("--nested-gitignore", type=float)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Compare against a saved JSON baseline")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="Fail when a metric grows by more than this factor over the baseline")
+    parser.add_argument("--min-seconds", type=float, default=0.005,
+                        help="Ignore timing regressions for stages faster than this")
+    args = parser.parse_args()
+
+    spec = make_spec(args.preset, focus_dirs=args.focus_dirs, depth=args.depth, fanout=args.fanout,
+                     files=args.files, ignore_density=args.ignore_density,
+                     nested_gitignore=args.nested_gitignore, seed=args.seed)
+    result = run_suite(spec, args.repeat)
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get("spec") != spec:
+            print("warning: baseline was recorded with a different repository spec")
+    print_report(result, baseline)
+
+    if args.save:
+        args.save.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"saved results to {args.save}")
+
+    if baseline:
+        regressions = compare(result, baseline, args.threshold, args.min_seconds)
+        for stage, metric, old, new, ratio in regressions:
+            print(f"REGRESSION {stage}.{metric}: {old} -> {new} ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Reproducible synthetic repositories for benchmarking the scan pipeline."""
+import random
+from pathlib import Path
+from typing import Dict
+
+EXTENSIONS = [".py", ".md", ".json", ".txt", ".bin", ".ts", ".go"]
+PLAIN_EXTENSIONS = EXTENSIONS[:5]
+IGNORED_DIR_NAMES = ["build", "node_modules", "__pycache__", "dist", "tmp_cache"]
+DETECTION_FILES = {
+    "python": "pyproject.toml",
+    "node": "package.json",
+    "go": "go.mod",
+    "rust": "Cargo.toml",
+}
+
+PRESETS: Dict[str, dict] = {
+    "small": {"focus_dirs": 2, "depth": 3, "fanout": 3, "files": 8},
+    "medium": {"focus_dirs": 4, "depth": 4, "fanout": 5, "files": 12},
+    "large": {"focus_dirs": 6, "depth": 5, "fanout": 6, "files": 16},
+}
+
+DEFAULT_SPEC = {
+    "focus_dirs": 3,
+    "depth": 4,
+    "fanout": 4,
+    "files": 10,
+    # Fraction of directories that get an extra ignored sibling (build/, node_modules/, ...)
+    "ignore_density": 0.2,
+    # Fraction of directories that carry their own .gitignore
+    "nested_gitignore": 0.1,
+    "profiles": ["python", "node"],
+    "seed": 0,
+}
+
+def make_spec(preset: str = None, **overrides) -> dict:
+    spec = dict(DEFAULT_SPEC)
+    if preset:
+        spec.update(PRESETS[preset])
+    spec.update({k: v for k, v in overrides.items() if v is not None})
+    return spec
+
+def build_tree(root: Path, depth: int, fanout: int, files: int):
+    """Create a plain tree with ``fanout`` subdirectories per level and one ``node_modules`` per directory."""
+    def _build(path: Path, level: int):
+        path.mkdir(parents=True, exist_ok=True)
+        for i in range(files):
+            (path / f"file_{i}{PLAIN_EXTENSIONS[i % len(PLAIN_EXTENSIONS)]}").touch()
+        if level == depth:
+            return
+        for i in range(fanout):
+            _build(path / f"dir_{i}", level + 1)
+        _build(path / "node_modules", depth)
+
+    _build(root, 0)
+
+def build_repo(root: Path, spec: dict) -> dict:
+    """Create a repository shaped by ``spec`` below ``root`` and return its statistics.
+
+    The same spec and seed always produce the same tree. The root gets a
+    ``.gitignore`` covering the ignored directory names, one detection file
+    per profile and ``focus_dirs`` top-level directories named ``focus_<n>``.
+    """
+    rng = random.Random(spec["seed"])
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    stats = {"dirs": 0, "files": 0, "ignored_dirs": 0, "gitignores": 1}
+
+    (root / ".gitignore").write_text("".join(f"{name}/\n" for name in IGNORED_DIR_NAMES) + "*.log\n")
+    for profile in spec["profiles"]:
+        (root / DETECTION_FILES[profile]).touch()
+
+    def _build(path: Path, level: int):
+        path.mkdir(exist_ok=True)
+        stats["dirs"] += 1
+        for i in range(spec["files"]):
+            (path / f"file_{i}{rng.choice(EXTENSIONS)}").touch()
+        stats["files"] += spec["files"]
+        if rng.random() < spec["nested_gitignore"]:
+            (path / ".gitignore").write_text(f"dir_{rng.randrange(max(spec['fanout'], 1))}_generated/\n*.bin\n")
+            stats["gitignores"] += 1
+        if level == spec["depth"]:
+            return
+        if rng.random() < spec["ignore_density"]:
+            ignored = path / rng.choice(IGNORED_DIR_NAMES)
+            ignored.mkdir(exist_ok=True)
+            for i in range(spec["files"]):
+                (ignored / f"artifact_{i}.js").touch()
+            stats["ignored_dirs"] += 1
+        for i in range(spec["fanout"]):
+            _build(path / f"dir_{i}", level + 1)
+
+    for i in range(spec["focus_dirs"]):
+        _build(root / f"focus_{i}", 1)
+    return stats
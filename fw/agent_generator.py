@@ -1,39 +1,92 @@
+import json
 from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
 
-def generate_agent_files(focus_dirs, config_dir: Path, project_dir: Path, config: dict):
-    created_files = set()
-    for dir_path in focus_dirs:
-        try:
-            dir_obj = Path(dir_path)
-            agent_name = _build_agent_filename(dir_obj)
-            if agent_name in created_files:
-                continue
+from fw.output import OutputStats, write_if_changed
+from fw.tree_cache import default_cache_dir
+
+AGENT_MANIFEST = "agents.json"
+TREES_DIR = "trees"
+
+# ``(path, symbols)`` of the files in a tree, or a function returning them
+Summaries = Union[List[Tuple[str, List[str]]], Callable[[], Optional[List[Tuple[str, List[str]]]]]]
 
-            tree_file = config_dir / f"tree_{dir_obj.name}.txt"
-            tree_content = ""
-            if tree_file.exists():
-                with open(tree_file, 'r', encoding='utf-8') as f:
-                    tree_content = f.read()
+def render_agent(dir_path, tree_lines: Iterable[str],
+                 summaries: Optional[Summaries] = None) -> Tuple[str, Iterator[str]]:
+    """File name and content chunks of the agent for ``dir_path``, relative to the project.
 
-            description = f"the {dir_obj.name} directory"
-            if dir_obj.parent != Path('.'):
-                description = f"the {dir_obj.name} directory within {dir_obj.parent}"
+    ``summaries`` are ``(path, symbols)`` pairs of the files in the tree,
+    listed after it when given, or a function returning them, called once
+    the tree lines are consumed.
+    """
+    dir_obj = Path(dir_path)
+    description = f"the {dir_obj.name} directory"
+    if dir_obj.parent != Path('.'):
+        description = f"the {dir_obj.name} directory within {dir_obj.parent}"
+    return _build_agent_filename(dir_obj), _agent_chunks(description, tree_lines, summaries)
 
-            agent_content = f"""You are an agent specialized in {description} of this project.
+def tree_file_path(project_dir: Path, rel_dir: str) -> Path:
+    """Where ``save_trees`` keeps the tree of ``rel_dir``: ``tree_<path>.txt``, or ``tree.txt`` for the root.
+
+    Path components are joined with ``_`` after escaping ``%`` and ``_``
+    inside them, so ``src/app`` and ``src_app`` get different files.
+    """
+    parts = [part.replace("%", "%25").replace("_", "%5F") for part in Path(rel_dir).parts]
+    tree_name = f"tree_{'_'.join(parts)}.txt" if parts else "tree.txt"
+    return default_cache_dir(project_dir) / TREES_DIR / tree_name
+
+def _agent_chunks(description: str, tree_lines: Iterable[str],
+                  summaries: Optional[Summaries] = None) -> Iterator[str]:
+    """The agent file as a stream of chunks, pulling tree lines lazily."""
+    yield f"""You are an agent specialized in {description} of this project.
 
 Your focus directory structure:
 
-{tree_content}
+"""
+    separator = ""
+    for line in tree_lines:
+        yield separator + line
+        separator = "\n"
+    if callable(summaries):
+        summaries = summaries()
+    if summaries:
+        yield "\n\nKey symbols by file:\n\n"
+        yield "\n".join(f"- {path}: {', '.join(symbols)}" for path, symbols in summaries)
+    yield """
 
 Only reference and modify files within this directory unless explicitly allowed otherwise.
 """
 
-            output_path = project_dir / agent_name
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(agent_content)
-            created_files.add(agent_name)
-        except Exception:
+def remove_stale_agents(project_dir: Path, current: Iterable[str], stats: Optional[OutputStats] = None):
+    """Delete agent files generated by an earlier run whose focus directory is gone.
+
+    Only files recorded in the project's manifest are candidates, so agent
+    files written by hand are never touched.
+    """
+    manifest_path = default_cache_dir(project_dir) / AGENT_MANIFEST
+    current = set(current)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            previous = set(json.load(f))
+    except (OSError, ValueError):
+        previous = set()
+
+    for name in sorted(previous - current):
+        try:
+            (project_dir / name).unlink()
+        except FileNotFoundError:
             continue
+        except OSError:
+            current.add(name)
+            continue
+        if stats is not None:
+            stats.removed += 1
+
+    try:
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        write_if_changed(manifest_path, json.dumps(sorted(current)))
+    except OSError:
+        pass
 
 def _build_agent_filename(dir_obj: Path):
     parts = list(dir_obj.parts)
@@ -0,0 +1,168 @@
+"""Headless agent generation across many projects."""
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Set, TextIO
+
+from fw.agent_generator import remove_stale_agents
+from fw.config_loader import CompiledConfig, load_config
+from fw.ignore import RulesCache
+from fw.metrics import Metrics
+from fw.output import OutputStats
+from fw.pipeline import DEFAULT_IO_WORKERS, run_agent_pipeline
+from fw.project_tree_generator import generate_project_trees
+from fw.summaries import open_summarizer
+from fw.tree_cache import TreeCache
+from fw.tree_model import TreeDiff, TreeRecorder, TreeSnapshot, diff_snapshots
+
+def read_project_list(stream: TextIO) -> List[str]:
+    """Read project paths one per line, skipping blank lines and ``#`` comments."""
+    paths = []
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            paths.append(line)
+    return paths
+
+def generate_project(project_path: str, config_file: Optional[str] = None, max_depth: Optional[int] = None,
+                     profile: bool = False) -> dict:
+    """Generate the agent files of one project without any prompts and return a summary.
+
+    Errors are reported in the summary instead of raised, so one broken
+    repository does not abort a batch. With ``profile`` the summary also
+    carries the stage timers and counters under ``metrics``.
+    """
+    # Always collected, for the line count; only reported with ``profile``
+    metrics = Metrics()
+    started = time.perf_counter()
+    summary = {
+        "project": project_path,
+        "ok": False,
+        "error": None,
+        "profiles": [],
+        "focus_dirs": 0,
+        "tree_lines": 0,
+        "agents": 0,
+        "files": {},
+        "timings": {},
+    }
+    timings = summary["timings"]
+    try:
+        project_dir = Path(project_path)
+        if not project_dir.is_dir():
+            raise FileNotFoundError(f"Project directory {project_dir} does not exist")
+
+        t = time.perf_counter()
+        config = load_config(Path(config_file) if config_file else project_dir / "config.yaml", project_dir, metrics)
+        if max_depth is not None:
+            config = config.replace(max_depth=max_depth)
+        summary["profiles"] = config.get("detected_profiles", [])
+        timings["config"] = round(time.perf_counter() - t, 4)
+
+        # Walking and writing overlap in the pipeline, so they are timed together
+        t = time.perf_counter()
+        recorder = TreeRecorder()
+        focus_dirs, trees = generate_project_trees(project_dir, project_dir, config, metrics=metrics,
+                                                   recorder=recorder)
+
+        stats = OutputStats()
+        with open_summarizer(project_dir, config, recorder, metrics) as summarize:
+            created = run_agent_pipeline(
+                project_dir,
+                [str(d.relative_to(project_dir)) for d in focus_dirs],
+                trees,
+                save_trees=config.get("save_trees", False),
+                stats=stats,
+                metrics=metrics,
+                workers=config.get("workers", 1),
+                io_workers=config.get("io_workers", DEFAULT_IO_WORKERS),
+                summarize=summarize
+            )
+        remove_stale_agents(project_dir, created, stats)
+        summary["focus_dirs"] = len(focus_dirs)
+        summary["tree_lines"] = metrics.counters.get("tree_lines", 0)
+        summary["agents"] = len(created)
+        summary["files"] = stats.as_dict()
+        timings["generate"] = round(time.perf_counter() - t, 4)
+        summary["ok"] = True
+    except Exception as e:
+        summary["error"] = f"{type(e).__name__}: {e}"
+    timings["total"] = round(time.perf_counter() - started, 4)
+    if profile:
+        summary["metrics"] = metrics.as_dict()
+    return summary
+
+class Cycle:
+    """Outcome of one ``regenerate`` run."""
+
+    __slots__ = ("focus_dirs", "created", "stats", "snapshot", "changes", "seconds")
+
+    def __init__(self, focus_dirs: List[Path], created: Set[str], stats: OutputStats, snapshot: TreeSnapshot,
+                 changes: Optional[TreeDiff], seconds: float):
+        self.focus_dirs = focus_dirs
+        self.created = created
+        self.stats = stats
+        self.snapshot = snapshot
+        self.changes = changes
+        self.seconds = seconds
+
+def regenerate(project_dir: Path, config_dir: Path, config: CompiledConfig, cache: Optional[TreeCache] = None,
+               metrics: Optional[Metrics] = None, only: Optional[List[Path]] = None,
+               baseline: Optional[TreeSnapshot] = None, rules_cache: Optional[RulesCache] = None) -> Cycle:
+    """Regenerate the agent files of every focus directory, or just ``only``, for long-running callers.
+
+    The tree ``cache`` is saved once the trees are walked, and ``rules_cache``
+    keeps the compiled ignore rules for the next run. The returned
+    snapshot is meant as the next run's ``baseline``: after a partial run it
+    is ``baseline`` updated with the directories that were scanned. Agents
+    whose focus directory disappeared are only removed by full runs.
+    """
+    started = time.perf_counter()
+    recorder = TreeRecorder()
+    focus_dirs, trees = generate_project_trees(project_dir, config_dir, config, cache=cache,
+                                               metrics=metrics, only=only, recorder=recorder,
+                                               rules_cache=rules_cache)
+
+    stats = OutputStats()
+    with open_summarizer(project_dir, config, recorder, metrics) as summarize:
+        created = run_agent_pipeline(
+            project_dir,
+            [str(d.relative_to(project_dir)) for d in focus_dirs],
+            trees,
+            save_trees=config.get("save_trees", False),
+            stats=stats,
+            metrics=metrics,
+            workers=config.get("workers", 1),
+            io_workers=config.get("io_workers", DEFAULT_IO_WORKERS),
+            summarize=summarize
+        )
+    # The trees are walked by the pipeline, so the cache is complete only now;
+    # a partial run keeps the listings of the focus directories it skipped
+    if cache is not None:
+        cache.save(prune=only is None)
+    # A partial run cannot tell which agents disappeared
+    if only is None:
+        remove_stale_agents(project_dir, created, stats)
+
+    snapshot = recorder.snapshot()
+    changes = None
+    if baseline is not None:
+        changes = diff_snapshots(baseline, snapshot)
+        if only is not None:
+            snapshot = baseline.merge(snapshot)
+    return Cycle(focus_dirs, created, stats, snapshot, changes, time.perf_counter() - started)
+
+def run_batch(project_paths: Iterable[str], jobs: int = 1, config_file: Optional[str] = None,
+              max_depth: Optional[int] = None, profile: bool = False) -> Iterator[dict]:
+    """Generate agents for every project, yielding each summary as soon as it is ready."""
+    project_paths = list(project_paths)
+    if jobs <= 1 or len(project_paths) <= 1:
+        for path in project_paths:
+            yield generate_project(path, config_file, max_depth, profile)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(project_paths))) as pool:
+        futures = [pool.submit(generate_project, path, config_file, max_depth, profile) for path in project_paths]
+        for future in as_completed(futures):
+            yield future.result()
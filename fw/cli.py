@@ -1,23 +1,32 @@
 import typer
-import questionary
 from rich.console import Console
-from rich.panel import Panel
-from rich.text import Text
-from typing import Optional, List
+from typing import Optional, List, TYPE_CHECKING
 
+import json
+import os
 import sys
 import time
 import shutil
 from pathlib import Path
 
-from fw.config_loader import load_config, detect_project_types, create_default_config, save_config
-from fw.project_tree_generator import ProjectTreeGenerator
-from fw.agent_generator import generate_agent_files
-from fw.profiles import list_profiles, LANGUAGE_PROFILES
+from fw.metrics import Metrics, append_metrics_log
+from fw.output import OutputStats
+
+if TYPE_CHECKING:
+    from fw.config_loader import CompiledConfig
+    from fw.tree_cache import TreeCache
+    from fw.tree_model import TreeDiff, TreeSnapshot
+
+# Everything else is imported inside the commands that use it, so startup
+# only pays for typer and headless runs never load the interactive UI stack
+# (questionary, prompt_toolkit). benchmarks/bench_startup.py guards this.
 
 app = typer.Typer()
 console = Console()
 
+# Set from the global options before any command runs
+_profiling = {"enabled": False, "pstats": None, "metrics_log": None}
+
 FLOW_WIZARD_LOGO = """
 ███████╗██╗      ██████╗ ██╗    ██╗
 ██╔════╝██║     ██╔═══██╗██║    ██║
@@ -35,6 +44,9 @@ FLOW_WIZARD_LOGO = """
 
 def display_welcome():
     """Display the welcome screen with the Flow Wizard logo"""
+    from rich.panel import Panel
+    from rich.text import Text
+
     logo_text = Text(FLOW_WIZARD_LOGO, style="bold cyan")
     welcome_panel = Panel(
         logo_text,
@@ -46,11 +58,236 @@ def display_welcome():
     console.print(welcome_panel)
     console.print("\n[bold yellow]Your AI-powered workflow assistant[/]\n")
 
+def _new_metrics() -> Optional[Metrics]:
+    if _profiling["enabled"] or _profiling["metrics_log"] is not None:
+        return Metrics()
+    return None
+
+def _print_profile(metrics: Metrics, target: Console = console):
+    """Print a stage breakdown and the counters of ``metrics``."""
+    from rich.table import Table
+
+    data = metrics.as_dict()
+    timers = data["timers"]
+    total = sum(seconds for name, seconds in timers.items() if "." not in name) or 1.0
+
+    table = Table(title="Profile", title_style="bold cyan", header_style="bold")
+    table.add_column("Stage")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Share", justify="right")
+    for name in sorted(name for name in timers if "." not in name):
+        seconds = timers[name]
+        table.add_row(name, f"{seconds:.4f}", f"{seconds / total:.0%}")
+        children = sorted(child for child in timers if child.startswith(name + "."))
+        for child in children:
+            table.add_row(f"  {child}", f"{timers[child]:.4f}", f"{timers[child] / total:.0%}")
+        rest = seconds - sum(timers[child] for child in children)
+        if children and rest > 0:
+            table.add_row(f"  {name} (other)", f"{rest:.4f}", f"{rest / total:.0%}")
+    target.print(table)
+
+    counters = Table(header_style="bold")
+    counters.add_column("Counter")
+    counters.add_column("Value", justify="right")
+    for name, value in sorted(data["counters"].items()):
+        counters.add_row(name, f"{value:,}")
+    target.print(counters)
+
+@app.callback(invoke_without_command=True)
+def _default(
+    ctx: typer.Context,
+    profile: bool = typer.Option(False, "--profile", help="Print a per-stage timing breakdown after each run."),
+    profile_out: Optional[Path] = typer.Option(None, "--profile-out", help="Also dump cProfile statistics to this file (implies --profile)."),
+    metrics_log: Optional[Path] = typer.Option(None, "--metrics-log", help="Append the metrics of every recurring cycle to this JSONL file."),
+):
+    """Open the interactive menu when no command is given."""
+    _profiling["enabled"] = profile or profile_out is not None
+    _profiling["pstats"] = profile_out
+    _profiling["metrics_log"] = metrics_log
+    if profile_out is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+
+        def _dump_profile():
+            profiler.disable()
+            profiler.dump_stats(str(profile_out))
+            Console(stderr=True).print(f"[cyan]cProfile statistics written to {profile_out}[/]")
+
+        ctx.call_on_close(_dump_profile)
+        profiler.enable()
+    if ctx.invoked_subcommand is None:
+        main_menu()
+
+@app.command()
+def generate(
+    paths: Optional[List[str]] = typer.Argument(None, help="Project directories; use '-' to read paths from stdin."),
+    manifest: Optional[Path] = typer.Option(None, "--manifest", "-m", help="File listing one project path per line."),
+    jobs: int = typer.Option(os.cpu_count() or 1, "--jobs", "-j", help="Number of projects processed in parallel."),
+    config: Optional[Path] = typer.Option(None, "--config", "-c", help="Config file used for every project instead of <project>/config.yaml."),
+    max_depth: Optional[int] = typer.Option(None, "--max-depth", help="Override max_depth from the config."),
+):
+    """
+    Generate agents for many projects without prompts, printing one JSON summary per project
+    """
+    from fw.batch import read_project_list, run_batch
+
+    project_paths = []
+    for path in paths or []:
+        if path == "-":
+            project_paths.extend(read_project_list(sys.stdin))
+        else:
+            project_paths.append(path)
+    if manifest is not None:
+        with open(manifest, 'r', encoding='utf-8') as f:
+            project_paths.extend(read_project_list(f))
+    if not project_paths:
+        project_paths = [str(Path.cwd())]
+
+    err_console = Console(stderr=True)
+    if _profiling["pstats"] is not None and jobs > 1:
+        # cProfile only sees this process
+        err_console.print("[yellow]--profile-out runs projects one at a time[/]")
+        jobs = 1
+    metrics = Metrics() if _profiling["enabled"] else None
+    failed = 0
+    started = time.perf_counter()
+    for summary in run_batch(project_paths, jobs, str(config) if config else None, max_depth, metrics is not None):
+        print(json.dumps(summary), flush=True)
+        if not summary["ok"]:
+            failed += 1
+        if metrics is not None:
+            metrics.merge(summary.get("metrics", {}))
+    err_console.print(
+        f"[bold]{len(project_paths) - failed}/{len(project_paths)} projects generated "
+        f"in {time.perf_counter() - started:.2f}s[/]"
+    )
+    if metrics is not None:
+        _print_profile(metrics, err_console)
+    if failed:
+        raise typer.Exit(code=1)
+
+@app.command()
+def daemon(
+    socket_path: Optional[Path] = typer.Option(None, "--socket", help="Unix socket to listen on (default: per-user runtime directory)."),
+    config: Optional[Path] = typer.Option(None, "--config", "-c", help="Config file used for every project instead of <project>/config.yaml."),
+    schedule_file: Optional[Path] = typer.Option(None, "--schedule", help="Also regenerate the projects of this schedule file on their intervals (see `fw schedule`)."),
+    max_concurrent: int = typer.Option(2, "--max-concurrent", help="Maximum number of scheduled scans running at once."),
+):
+    """
+    Keep projects warm in memory and regenerate their agents on requests sent with `fw client`
+    """
+    from fw.client import DaemonError
+    from fw.daemon import Daemon
+
+    server = Daemon(socket_path, config)
+    err_console = Console(stderr=True)
+    if schedule_file is not None:
+        from fw.scheduler import DEFAULT_INTERVAL, DEFAULT_JITTER, DEFAULT_MAX_BACKOFF
+
+        server.scheduler = _build_scheduler(server, [], schedule_file, DEFAULT_INTERVAL, max_concurrent,
+                                            DEFAULT_JITTER, DEFAULT_MAX_BACKOFF)
+        err_console.print(f"[cyan]Scheduled {len(server.scheduler.projects)} projects[/]")
+    err_console.print(f"[cyan]Listening on {server.socket_path}[/]")
+    try:
+        server.serve()
+    except DaemonError as e:
+        err_console.print(f"[bold red]{e}[/]")
+        raise typer.Exit(code=1)
+    except KeyboardInterrupt:
+        pass
+
+@app.command()
+def schedule(
+    paths: Optional[List[str]] = typer.Argument(None, help="Project directories, each regenerated every --interval minutes."),
+    schedule_file: Optional[Path] = typer.Option(None, "--file", "-f", help="File listing one project per line, optionally followed by interval=<minutes> and priority=<n>."),
+    interval: float = typer.Option(1.0, "--interval", "-i", help="Minutes between runs of projects without their own interval."),
+    max_concurrent: int = typer.Option(2, "--max-concurrent", help="Maximum number of scans running at once, across all projects."),
+    jitter: float = typer.Option(0.1, "--jitter", help="Random shift of each run, as a fraction of the project's interval."),
+    max_backoff: int = typer.Option(8, "--max-backoff", help="Unchanged projects slow down to at most this many times their interval."),
+    config: Optional[Path] = typer.Option(None, "--config", "-c", help="Config file used for every project instead of <project>/config.yaml."),
+):
+    """
+    Regenerate many projects on recurring schedules in one process, printing one JSON line per run
+    """
+    import threading
+    from fw.daemon import Daemon
+
+    output_lock = threading.Lock()
+
+    def _report(response: dict):
+        with output_lock:
+            print(json.dumps(response), flush=True)
+            if _profiling["metrics_log"] is not None:
+                append_metrics_log(_profiling["metrics_log"], {"timestamp": time.time(), **response})
+
+    server = Daemon(config_file=config)
+    scheduler = _build_scheduler(server, paths or [], schedule_file, interval,
+                                 max_concurrent, jitter, max_backoff, _report)
+    err_console = Console(stderr=True)
+    err_console.print(f"[cyan]Scheduled {len(scheduler.projects)} projects, "
+                      f"at most {max_concurrent} scans at once (Ctrl+C to stop)[/]")
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        server.flush()
+
+def _build_scheduler(server, paths: List[str], schedule_file: Optional[Path], interval: float, max_concurrent: int,
+                     jitter: float, max_backoff: int, on_result=None):
+    """A ``Scheduler`` on ``server`` holding ``paths`` and the projects of ``schedule_file``."""
+    from fw.scheduler import Scheduler, read_schedule
+
+    entries = [(path, {}) for path in paths]
+    try:
+        if schedule_file is not None:
+            with open(schedule_file, 'r', encoding='utf-8') as f:
+                entries.extend(read_schedule(f))
+        if not entries:
+            entries = [(str(Path.cwd()), {})]
+        scheduler = Scheduler(server, max_concurrent, jitter, max_backoff, on_result)
+        for path, options in entries:
+            scheduler.add(path, options.get("interval", interval), options.get("priority", 0))
+    except (ValueError, FileNotFoundError) as e:
+        Console(stderr=True).print(f"[bold red]{e}[/]")
+        raise typer.Exit(code=1)
+    return scheduler
+
+@app.command()
+def client(
+    command: str = typer.Argument(..., help="regenerate, status, metrics or shutdown."),
+    paths: Optional[List[str]] = typer.Argument(None, help="With regenerate: only the focus directories holding these paths (relative to the project)."),
+    project: Optional[Path] = typer.Option(None, "--project", "-p", help="Project directory (default: current directory)."),
+    socket_path: Optional[Path] = typer.Option(None, "--socket", help="Socket of the daemon (default: per-user runtime directory)."),
+):
+    """
+    Send one request to a running `fw daemon` and print its JSON response
+    """
+    from fw.client import DaemonError, send_request
+
+    request = {"cmd": command}
+    project_dir = (project or Path.cwd()).resolve()
+    if command == "regenerate" or project is not None:
+        request["project"] = str(project_dir)
+    if paths:
+        # Relative paths are relative to the project, like the focus directories
+        request["paths"] = [str((project_dir / p).resolve()) for p in paths]
+    try:
+        response = send_request(request, socket_path)
+    except DaemonError as e:
+        Console(stderr=True).print(f"[bold red]{e}[/]")
+        raise typer.Exit(code=2)
+    print(json.dumps(response))
+    if not response.get("ok"):
+        raise typer.Exit(code=1)
+
 @app.command()
 def main_menu():
     """
     Main interactive menu for FlowWizard
     """
+    import questionary
+
     display_welcome()
     
     while True:
@@ -79,6 +316,15 @@ def main_menu():
             break
 
 def _generate_agents():
+    import questionary
+    from fw.agent_generator import remove_stale_agents
+    from fw.config_loader import load_config, detect_project_types, create_default_config, save_config
+    from fw.pipeline import DEFAULT_IO_WORKERS, run_agent_pipeline
+    from fw.profiles import list_profiles, LANGUAGE_PROFILES
+    from fw.project_tree_generator import generate_project_trees
+    from fw.summaries import open_summarizer
+    from fw.tree_model import TreeRecorder
+
     try:
         console.print("\n[bold cyan]🤖 Agent Generation[/]\n")
         
@@ -158,7 +404,8 @@ def _generate_agents():
             console.print(f"\n[bold green]✨ Created default config.yaml in {project_dir}[/]")
         
         # Load config (will merge with profiles)
-        config = load_config(config_file, project_dir)
+        metrics = _new_metrics()
+        config = load_config(config_file, project_dir, metrics)
         
         # Continue with existing flow...
         max_depth_str = questionary.text(
@@ -174,9 +421,9 @@ def _generate_agents():
             return
             
         if max_depth_str.strip().isdigit():
-            config["max_depth"] = int(max_depth_str.strip())
+            config = config.replace(max_depth=int(max_depth_str.strip()))
         else:
-            config["max_depth"] = 3
+            config = config.replace(max_depth=3)
 
         with console.status("[bold cyan]🔍 Analyzing project structure...[/]") as status:
             cursorrules_example = config_dir / ".cursorrules.example"
@@ -185,65 +432,143 @@ def _generate_agents():
                 shutil.copy2(cursorrules_example, project_cursorrules)
                 console.print(f"[bold green]✨ Copied .cursorrules to {project_cursorrules}[/]")
 
-            generator = ProjectTreeGenerator(project_dir, config_dir, config)
-            focus_dirs = generator.find_focus_dirs(project_dir, config.get("tree_focus", []))
-
-            processed_dirs = set()
-            config_paths = {str(Path(fd)) for fd in config.get("tree_focus", [])}
-            
             console.print("\n[bold cyan]📁 Processing directories:[/]")
-            for focus_dir in focus_dirs:
-                rel_path = focus_dir.relative_to(project_dir)
-                if any(str(rel_path).startswith(str(pd)) for pd in processed_dirs):
-                    continue
-
+            recorder = TreeRecorder()
+            focus_dirs, trees = generate_project_trees(project_dir, config_dir, config, metrics=metrics,
+                                                       recorder=recorder)
+            for rel_path in trees:
                 console.print(f"[cyan]  ├─ Processing[/] [bold white]{rel_path}[/]")
-                tree_content = generator.generate_tree(
-                    focus_dir,
-                    max_depth=config.get("max_depth", 3),
-                    config_paths=config_paths
-                )
-
-                tree_file = config_dir / f"tree_{focus_dir.name}.txt"
-                with open(tree_file, 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(tree_content))
-
-                processed_dirs.add(rel_path)
 
+            stats = OutputStats()
             console.print("[cyan]  └─ Generating agent files...[/]")
-            generate_agent_files(
-                [str(d.relative_to(project_dir)) for d in focus_dirs],
-                config_dir,
-                project_dir,
-                config
-            )
+            with open_summarizer(project_dir, config, recorder, metrics) as summarize:
+                created = run_agent_pipeline(
+                    project_dir,
+                    [str(d.relative_to(project_dir)) for d in focus_dirs],
+                    trees,
+                    save_trees=config.get("save_trees", False),
+                    stats=stats,
+                    metrics=metrics,
+                    workers=config.get("workers", 1),
+                    io_workers=config.get("io_workers", DEFAULT_IO_WORKERS),
+                    summarize=summarize
+                )
+            remove_stale_agents(project_dir, created, stats)
         
-        console.print("\n[bold green]✅ Agent generation complete![/]\n")
+        console.print(f"\n[bold green]✅ Agent generation complete![/] [cyan]({stats})[/]\n")
+        if _profiling["enabled"]:
+            _print_profile(metrics)
 
     except KeyboardInterrupt:
         console.print("\n[yellow]↩️ Returning to main menu...[/]\n")
         return
 
+def _run_cycle(project_dir: Path, config_dir: Path, config: "CompiledConfig", tree_cache: "TreeCache",
+               only: Optional[List[Path]] = None, baseline: Optional["TreeSnapshot"] = None):
+    """Regenerate trees and agent files for every focus directory, or just ``only``.
+
+    Returns the focus directories, the output stats, a snapshot of the scan
+    to pass as the next cycle's ``baseline`` and the differences from
+    ``baseline`` (None without one). Each cycle's metrics are printed with
+    ``--profile`` and appended to the ``--metrics-log`` file, if one was given.
+    """
+    from fw.batch import regenerate
+
+    metrics = _new_metrics()
+    cycle = regenerate(project_dir, config_dir, config, cache=tree_cache, metrics=metrics,
+                       only=only, baseline=baseline)
+
+    if metrics is not None:
+        if _profiling["metrics_log"] is not None:
+            append_metrics_log(_profiling["metrics_log"], {
+                "timestamp": time.time(),
+                "project": str(project_dir),
+                "partial": only is not None,
+                "seconds": round(cycle.seconds, 4),
+                "focus_dirs": [str(d.relative_to(project_dir)) for d in cycle.focus_dirs],
+                "files": cycle.stats.as_dict(),
+                "changes": cycle.changes.as_dict() if cycle.changes is not None else None,
+            }, metrics)
+        if _profiling["enabled"]:
+            _print_profile(metrics)
+    return cycle.focus_dirs, cycle.stats, cycle.snapshot, cycle.changes
+
+def _print_changes(project_dir: Path, focus_dirs: List[Path], changes: Optional["TreeDiff"], limit: int = 10):
+    """Summarize what changed since the previous cycle and which agents it touched."""
+    if not changes:
+        return
+    affected = [str(d.relative_to(project_dir)) for d in focus_dirs
+                if changes.affects(str(d.relative_to(project_dir)))]
+    console.print(f"[cyan]📝 {changes}[/]" + (f" [cyan]in[/] [bold white]{', '.join(affected)}[/]" if affected else ""))
+    paths = [("+", p) for p in changes.added] + [("-", p) for p in changes.removed]
+    for sign, path in paths[:limit]:
+        console.print(f"   [{'green' if sign == '+' else 'red'}]{sign} {path}[/]")
+    if len(paths) > limit:
+        console.print(f"   [dim]… and {len(paths) - limit} more[/]")
+
+def _watch_loop(project_dir: Path, config_dir: Path, config: "CompiledConfig", tree_cache: "TreeCache",
+                focus_dirs: List[Path], baseline: Optional["TreeSnapshot"] = None):
+    """Regenerate only the focus directories whose subtrees changed, as soon as they change."""
+    from fw.watcher import create_watcher
+
+    # Summaries show file contents, so edits matter too
+    with create_watcher(focus_dirs, config.get("exclude_dirs", []), config.get("max_depth", 3),
+                        contents=config.get("summaries", False)) as watcher:
+        console.print(f"[cyan]👀 Watching {len(focus_dirs)} directories ({type(watcher).__name__})[/]")
+        console.print("[yellow](Press Ctrl+C to stop and return to main menu)[/]\n")
+        while True:
+            changed = watcher.wait()
+            affected = [
+                d for d in focus_dirs
+                if any(c == str(d) or c.startswith(str(d) + os.sep) for c in changed)
+            ]
+            if not affected:
+                continue
+            _, stats, baseline, changes = _run_cycle(project_dir, config_dir, config, tree_cache,
+                                                     only=affected, baseline=baseline)
+            names = ", ".join(str(d.relative_to(project_dir)) for d in affected)
+            console.print(f"[bold green]✅ Regenerated agents for[/] [bold white]{names}[/] [cyan]({stats})[/]")
+            _print_changes(project_dir, affected, changes)
+
 def _configure_recurring():
+    import questionary
+    from fw.config_loader import load_config
+    from fw.tree_cache import TreeCache, default_cache_dir
+
     try:
         console.print("\n[bold cyan]⚙️  Recurring Mode Configuration[/]\n")
-        
-        minute_str = questionary.text(
-            "Enter interval in minutes (default 1, Ctrl+C to go back):",
+
+        use_watch = questionary.confirm(
+            "Watch for file changes instead of regenerating on a fixed interval?",
+            default=True,
             style=questionary.Style([
                 ('qmark', 'fg:cyan bold'),
                 ('question', 'bold'),
             ])
         ).ask()
-        
-        if minute_str is None:  # User pressed Ctrl+C
+
+        if use_watch is None:  # User pressed Ctrl+C
             console.print("\n[yellow]↩️ Returning to main menu...[/]\n")
             return
-            
-        try:
-            interval = int(minute_str)
-        except:
-            interval = 1
+
+        interval = 1
+        if not use_watch:
+            minute_str = questionary.text(
+                "Enter interval in minutes (default 1, Ctrl+C to go back):",
+                style=questionary.Style([
+                    ('qmark', 'fg:cyan bold'),
+                    ('question', 'bold'),
+                ])
+            ).ask()
+
+            if minute_str is None:  # User pressed Ctrl+C
+                console.print("\n[yellow]↩️ Returning to main menu...[/]\n")
+                return
+
+            try:
+                interval = int(minute_str)
+            except:
+                interval = 1
 
         project_path_str = questionary.text(
             "Enter project path (or leave blank to use current directory, Ctrl+C to go back):",
@@ -273,42 +598,25 @@ def _configure_recurring():
             shutil.copy2(cursorrules_example, project_cursorrules)
             console.print(f"[bold green]✨ Copied .cursorrules to {project_cursorrules}[/]")
 
-        console.print(f"\n[bold cyan]🔄 Starting recurring mode (interval: {interval} minutes)[/]")
+        tree_cache = TreeCache(default_cache_dir(project_dir) / "tree_cache.json")
+
+        if use_watch:
+            console.print("\n[bold cyan]🔄 Starting watch mode[/]")
+        else:
+            console.print(f"\n[bold cyan]🔄 Starting recurring mode (interval: {interval} minutes)[/]")
         console.print("[yellow]Note: Press Ctrl+C to stop and return to main menu[/]\n")
         
+        baseline = None
         while True:
             try:
                 with console.status("[bold cyan]🔍 Processing project...[/]") as status:
-                    generator = ProjectTreeGenerator(project_dir, config_dir, config)
-                    focus_dirs = generator.find_focus_dirs(project_dir, config.get("tree_focus", []))
-
-                    processed_dirs = set()
-                    config_paths = {str(Path(fd)) for fd in config.get("tree_focus", [])}
-                    
-                    for focus_dir in focus_dirs:
-                        rel_path = focus_dir.relative_to(project_dir)
-                        if any(str(rel_path).startswith(str(pd)) for pd in processed_dirs):
-                            continue
-
-                        tree_content = generator.generate_tree(
-                            focus_dir,
-                            max_depth=config.get("max_depth", 3),
-                            config_paths=config_paths
-                        )
-                        tree_file = config_dir / f"tree_{focus_dir.name}.txt"
-                        with open(tree_file, 'w', encoding='utf-8') as f:
-                            f.write('\n'.join(tree_content))
-
-                        processed_dirs.add(rel_path)
-
-                    generate_agent_files(
-                        [str(d.relative_to(project_dir)) for d in focus_dirs],
-                        config_dir,
-                        project_dir,
-                        config
-                    )
+                    focus_dirs, stats, baseline, changes = _run_cycle(project_dir, config_dir, config, tree_cache,
+                                                                      baseline=baseline)
                     
-                console.print("[bold green]✅ Agent generation cycle complete![/]")
+                console.print(f"[bold green]✅ Agent generation cycle complete![/] [cyan]({stats})[/]")
+                _print_changes(project_dir, focus_dirs, changes)
+                if use_watch:
+                    _watch_loop(project_dir, config_dir, config, tree_cache, focus_dirs, baseline)
                 console.print(f"[cyan]⏰ Waiting {interval} minutes until next cycle...[/]")
                 console.print("[yellow](Press Ctrl+C to stop and return to main menu)[/]\n")
                 time.sleep(interval * 60)
@@ -0,0 +1,65 @@
+"""Talk to a running ``fw daemon`` over its Unix-domain socket.
+
+Requests and responses are single JSON objects, one per line::
+
+    {"cmd": "regenerate", "project": "/path/to/project", "paths": ["src/app.py"]}
+    {"ok": true, "project": "/path/to/project", "focus_dirs": ["src"], ...}
+
+Commands are ``regenerate`` (a whole project, or the focus directories
+holding ``paths``), ``status``, ``metrics`` and ``shutdown``. This module
+only needs the standard library, so clients start fast.
+"""
+import json
+import os
+import socket
+import stat
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+SOCKET_NAME = "flowwizard.sock"
+
+class DaemonError(RuntimeError):
+    pass
+
+def default_socket_path() -> Path:
+    """Per-user socket path, in ``$XDG_RUNTIME_DIR`` when set."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / SOCKET_NAME
+    return Path(tempfile.gettempdir()) / f"flowwizard-{os.getuid()}" / SOCKET_NAME
+
+def check_socket(socket_path: Path):
+    """Raise ``DaemonError`` unless ``socket_path`` is a socket of this user that no one else may connect to.
+
+    Sockets may live in shared directories like ``/tmp``, and the default
+    directory has a predictable name another user could have created
+    first, so it is the socket itself that must be private.
+    """
+    try:
+        st = os.lstat(socket_path)
+    except FileNotFoundError:
+        raise DaemonError(f"No daemon is listening on {socket_path}") from None
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) & 0o077:
+        raise DaemonError(f"{socket_path} is not a socket owned by the current user and closed to others (e.g. mode 0600)")
+
+def send_request(request: dict, socket_path: Optional[Path] = None, timeout: Optional[float] = None) -> dict:
+    """Send one request to the daemon and return its response.
+
+    Raises ``DaemonError`` if no daemon listens on ``socket_path`` or it
+    fails ``check_socket``.
+    """
+    socket_path = socket_path or default_socket_path()
+    check_socket(socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(os.fspath(socket_path))
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise DaemonError(f"No daemon is listening on {socket_path}") from e
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile('rb') as f:
+            line = f.readline()
+    if not line:
+        raise DaemonError("The daemon closed the connection without answering")
+    return json.loads(line)
@@ -1,38 +1,203 @@
-import yaml
+import hashlib
+import json
+import os
+import time
+from collections.abc import Mapping
 from pathlib import Path
-from typing import List, Optional
-from .profiles import LANGUAGE_PROFILES, get_profile, merge_profiles
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from . import __version__
+from .detection import DEFAULT_DETECT_DEPTH, detect_root_types, scan_subprojects
+from .filters import compile_suffix_matcher
+from .metrics import Metrics
+from .profiles import merge_profiles
+from .tree_cache import RACY_WINDOW_NS, default_cache_dir
+
+# Bump when the fields of ``CompiledConfig.to_dict`` change; records of another
+# version, or written by another FlowWizard release, are ignored
+CONFIG_CACHE_VERSION = 2
+CONFIG_CACHE_FILE = "config.json"
+
+# Keys a config file may override; lists extend the profile defaults
+OVERRIDE_KEYS = ["tree_focus", "important_dirs", "exclude_dirs", "include_extensions", "max_depth", "workers", "save_trees",
+                 "max_entries_per_dir", "max_tree_lines", "max_tree_bytes", "detect_depth",
+                 "io_workers", "tree_backend", "git_untracked",
+                 "summaries", "summary_workers", "follow_symlinks", "max_scan_entries", "max_scan_seconds"]
+
+class CompiledConfig(Mapping):
+    """Read-only merged configuration with its filters precompiled.
+
+    Behaves like the plain dict ``load_config`` used to return (lists become
+    tuples, nested dicts read-only views) and adds ``exclude_dirs`` and
+    ``include_extensions`` as frozensets, ``has_extension`` as a compiled
+    suffix matcher and ``config_paths``, the ``tree_focus`` entries as paths.
+    ``overrides`` keeps the settings read from the config file, which
+    subprojects merge with their own profiles. Use ``replace`` to derive a
+    changed copy.
+    """
+
+    __slots__ = ("_data", "overrides", "exclude_dirs", "include_extensions", "has_extension", "config_paths")
+
+    def __init__(self, data: Dict[str, Any], overrides: Optional[Dict[str, Any]] = None):
+        self._data = MappingProxyType({key: _freeze(value) for key, value in data.items()})
+        self.exclude_dirs: FrozenSet[str] = frozenset(data.get("exclude_dirs", ()))
+        self.include_extensions: FrozenSet[str] = frozenset(data.get("include_extensions", ()))
+        self.has_extension = compile_suffix_matcher(dict.fromkeys(data.get("include_extensions", ())))
+        self.config_paths: FrozenSet[str] = frozenset(str(Path(fd)) for fd in data.get("tree_focus", ()))
+        self.overrides = MappingProxyType({key: _freeze(value) for key, value in (overrides or {}).items()
+                                           if key in OVERRIDE_KEYS or key == "domain_patterns"})
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"CompiledConfig({self.to_dict()!r})"
+
+    def replace(self, **changes) -> "CompiledConfig":
+        overrides = {key: _thaw(value) for key, value in self.overrides.items()}
+        overrides.update((key, value) for key, value in changes.items() if key in OVERRIDE_KEYS)
+        return CompiledConfig(dict(self.to_dict(), **changes), overrides)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """A mutable deep copy, suitable for ``save_config`` or JSON."""
+        return {key: _thaw(value) for key, value in self._data.items()}
+
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    return value
+
+def _thaw(value):
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    return value
 
 def detect_project_types(project_dir: Path) -> List[str]:
     """Detect all language profiles that match the project."""
-    detected_types = []
-    
-    for lang, profile in LANGUAGE_PROFILES.items():
-        if any((project_dir / file).exists() for file in profile["detection_files"]):
-            detected_types.append(lang)
-    
-    return detected_types or ["python"]  # Default to python if nothing detected
-
-def load_config(config_file: Path, project_dir: Path) -> dict:
-    """Load configuration with support for language profiles."""
-    config_data = {}
-    
-    # Try to load user's config file
-    if config_file.exists():
-        with open(config_file, 'r', encoding='utf-8') as f:
-            config_data = yaml.safe_load(f) or {}
-    
+    return detect_root_types(project_dir) or ["python"]  # Default to python if nothing detected
+
+def subproject_configs(project_dir: Path, config: CompiledConfig) -> List[Tuple[str, CompiledConfig]]:
+    """Configs of the workspace packages found up to ``detect_depth`` levels below the root.
+
+    Each package gets its own profiles merged with the config file's
+    settings, and the ``tree_focus`` of those profiles relative to it.
+    """
+    depth = config.get("detect_depth", DEFAULT_DETECT_DEPTH)
+    if not depth:
+        return []
+    found = scan_subprojects(project_dir, depth, config.get("exclude_dirs", ()))
+    configs = []
+    for rel_path, profiles in found.items():
+        if not rel_path:
+            continue
+        overrides = {key: _thaw(value) for key, value in config.overrides.items() if key != "tree_focus"}
+        data = _merge_config(overrides, profiles)
+        data["tree_focus"] = [f"{rel_path}/{fd}" for fd in data["tree_focus"]]
+        configs.append((rel_path, CompiledConfig(data, overrides)))
+    return configs
+
+# In-process memo of load_config, keyed on (config file, project dir)
+_config_memo: Dict[Tuple[str, str], Tuple[dict, CompiledConfig]] = {}
+
+def clear_config_cache():
+    """Forget configs memoized by this process (the on-disk cache is kept)."""
+    _config_memo.clear()
+
+def load_config(config_file: Path, project_dir: Path, metrics: Optional[Metrics] = None,
+                cache: bool = True) -> CompiledConfig:
+    """Load configuration with support for language profiles.
+
+    Results are memoized in memory and in the project's cache directory,
+    keyed on the config file's mtime, size and content hash, the profiles it
+    selects and, when profiles are auto-detected, the project directory's
+    mtime (detection files live at its top level). An unchanged config costs
+    a ``stat`` of the file (and of the project directory when detecting)
+    instead of a YAML parse and a profile merge. A file modified within the
+    racy window of its mtime is re-read and compared by hash.
+    """
+    started = time.perf_counter()
+    config_file, project_dir = Path(config_file), Path(project_dir)
+    memo_key = (os.fspath(config_file), os.fspath(project_dir))
+    record = compiled = None
+    if cache:
+        record, compiled = _config_memo.get(memo_key) or (_read_config_cache(project_dir, memo_key), None)
+
+    file_state = _stat_state(config_file)
+    if record is not None and file_state is not None and file_state == record["file_state"]:
+        config_data, digest = record["config_data"], record["digest"]
+    else:
+        # Try to load user's config file
+        try:
+            with open(config_file, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            config_data, digest = {}, None
+        else:
+            digest = hashlib.sha1(raw).hexdigest()
+            if record is not None and digest == record["digest"]:
+                config_data = record["config_data"]
+            else:
+                import yaml
+                config_data = yaml.safe_load(raw) or {}
+    if metrics is not None:
+        metrics.add_time("config.parse", time.perf_counter() - started)
+
     # Handle profiles in config
     profiles = config_data.get("profiles", [])
+    dir_state = None
     if not profiles:
         # Auto-detect if no profiles specified
-        profiles = detect_project_types(project_dir)
-    
+        t = time.perf_counter()
+        dir_state = _stat_state(project_dir)
+        if record is not None and dir_state is not None and dir_state == record["dir_state"]:
+            profiles = record["profiles"]
+        else:
+            profiles = detect_project_types(project_dir)
+        if metrics is not None:
+            metrics.add_time("config.detect", time.perf_counter() - t)
+
+    unchanged = record is not None and digest == record["digest"] and profiles == record["profiles"]
+    if not unchanged:
+        compiled = CompiledConfig(_merge_config(config_data, profiles), config_data)
+    elif compiled is None:
+        compiled = CompiledConfig(record["config"], config_data)
+
+    if cache and not (unchanged and file_state == record["file_state"] and dir_state == record["dir_state"]):
+        record = {
+            "version": CONFIG_CACHE_VERSION,
+            "fw_version": __version__,
+            "key": list(memo_key),
+            "file_state": file_state,
+            "dir_state": dir_state,
+            "digest": digest,
+            "config_data": config_data,
+            "profiles": profiles,
+            "config": compiled.to_dict(),
+        }
+        _write_config_cache(project_dir, record)
+    if cache:
+        _config_memo[memo_key] = (record, compiled)
+
+    if metrics is not None:
+        metrics.add_time("config", time.perf_counter() - started)
+    return compiled
+
+def _merge_config(config_data: dict, profiles: List[str]) -> dict:
     # Get base config from profiles
     base_config = merge_profiles(profiles)
-    
+
     # Override with user's custom settings
-    for key in ["tree_focus", "important_dirs", "exclude_dirs", "include_extensions", "max_depth"]:
+    for key in OVERRIDE_KEYS:
         if key in config_data:
             if isinstance(config_data[key], list):
                 # For lists, extend the base config
@@ -42,27 +207,67 @@ def load_config(config_file: Path, project_dir: Path) -> dict:
             else:
                 # For non-lists (like max_depth), just override
                 base_config[key] = config_data[key]
-    
+
     # Add custom domain patterns if specified
     if "domain_patterns" in config_data:
         base_config["domain_patterns"].update(config_data["domain_patterns"])
-    
+
     # Store detected/specified profiles in config
-    base_config["detected_profiles"] = profiles
-    
+    base_config["detected_profiles"] = list(profiles)
     return base_config
 
+def _stat_state(path: Path) -> Optional[List[int]]:
+    """``[mtime_ns, size]`` of ``path``, or None if it is missing or too recently modified to trust."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if time.time_ns() - st.st_mtime_ns < RACY_WINDOW_NS:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def _read_config_cache(project_dir: Path, memo_key: Tuple[str, str]) -> Optional[dict]:
+    try:
+        with open(default_cache_dir(project_dir) / CONFIG_CACHE_FILE, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if record.get("version") != CONFIG_CACHE_VERSION or record.get("fw_version") != __version__ \
+            or record.get("key") != list(memo_key):
+        return None
+    return record
+
+def _write_config_cache(project_dir: Path, record: dict):
+    cache_file = default_cache_dir(project_dir) / CONFIG_CACHE_FILE
+    try:
+        payload = json.dumps(record)
+    except (TypeError, ValueError):
+        payload = None
+    if payload is None or json.loads(payload) != record:
+        # YAML values JSON cannot round-trip (dates, int keys, ...) are only memoized in memory
+        return
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix(".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+
 def create_default_config(project_dir: Path, profiles: Optional[List[str]] = None) -> dict:
     """Create a default config file for the project."""
     if profiles is None:
         profiles = detect_project_types(project_dir)
-    
+
     config = merge_profiles(profiles)
     config["profiles"] = profiles
-    
+
     return config
 
 def save_config(config: dict, config_file: Path) -> None:
     """Save configuration to a file."""
+    import yaml
+
     with open(config_file, 'w', encoding='utf-8') as f:
         yaml.safe_dump(config, f, default_flow_style=False, sort_keys=False)
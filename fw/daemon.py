@@ -0,0 +1,243 @@
+"""Resident server behind ``fw daemon``, regenerating agents on requests from ``fw.client``.
+
+Each project keeps its tree cache, its compiled ignore rules, the snapshot
+of its last scan and its focus directories in memory, and configs and git
+indexes stay memoized by their modules, so a request only pays for the
+directories and files that changed. Tree caches are written to disk at
+most every ``TREE_CACHE_SAVE_INTERVAL`` seconds and on exit. Requests for different projects run in parallel; requests for
+the same project queue up behind each other.
+"""
+import json
+import os
+import socketserver
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fw.batch import regenerate
+from fw.client import DaemonError, check_socket, default_socket_path, send_request
+from fw.config_loader import load_config
+from fw.ignore import RulesCache
+from fw.metrics import Metrics
+from fw.tree_cache import TreeCache, default_cache_dir
+from fw.tree_model import TreeSnapshot
+
+# Seconds between writes of a project's tree cache; the last changes are written on exit
+TREE_CACHE_SAVE_INTERVAL = 30.0
+
+class ProjectState:
+    """What the daemon remembers about one project between requests."""
+
+    __slots__ = ("project_dir", "config_file", "tree_cache", "ignore_rules", "baseline", "focus_dirs", "lock",
+                 "runs", "last", "metrics")
+
+    def __init__(self, project_dir: Path, config_file: Path):
+        self.project_dir = project_dir
+        self.config_file = config_file
+        self.tree_cache = TreeCache(default_cache_dir(project_dir) / "tree_cache.json",
+                                    save_interval=TREE_CACHE_SAVE_INTERVAL)
+        self.ignore_rules: RulesCache = {}
+        self.baseline: Optional[TreeSnapshot] = None
+        self.focus_dirs: Optional[List[Path]] = None
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.last: Optional[dict] = None
+        # Summed over every run
+        self.metrics = Metrics()
+
+    def affected(self, paths: List[str]) -> List[Path]:
+        """Focus directories holding, held by or equal to any of ``paths`` (relative or absolute)."""
+        targets = [self.project_dir / p for p in paths]
+        return [d for d in self.focus_dirs
+                if any(t == d or d in t.parents or t in d.parents for t in targets)]
+
+    def as_dict(self) -> dict:
+        return {
+            "project": str(self.project_dir),
+            "config": str(self.config_file),
+            "runs": self.runs,
+            "busy": self.lock.locked(),
+            "focus_dirs": [str(d.relative_to(self.project_dir)) for d in self.focus_dirs or ()],
+            "last": self.last,
+        }
+
+class Daemon:
+    """Dispatches requests to per-project state; ``serve`` listens on ``socket_path``.
+
+    ``config_file`` replaces ``<project>/config.yaml`` for every project, like
+    ``fw generate --config``; a request may name its own ``config``.
+    """
+
+    def __init__(self, socket_path: Optional[Path] = None, config_file: Optional[Path] = None):
+        self.socket_path = Path(socket_path) if socket_path else default_socket_path()
+        self.config_file = config_file
+        self.started = time.time()
+        self.projects: Dict[str, ProjectState] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.BaseServer] = None
+        # A ``fw.scheduler.Scheduler`` run alongside by ``serve`` and reported by ``status``
+        self.scheduler = None
+
+    def handle(self, request: dict) -> dict:
+        """Answer one request; failures become ``{"ok": false, "error": ...}`` responses."""
+        handler = {
+            "regenerate": self._regenerate,
+            "status": self._status,
+            "metrics": self._metrics,
+            "shutdown": self._shutdown,
+        }.get(request.get("cmd"))
+        if handler is None:
+            return {"ok": False, "error": f"Unknown command {request.get('cmd')!r}"}
+        try:
+            return handler(request)
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    def project(self, path: str, config_file: Optional[str] = None) -> ProjectState:
+        project_dir = Path(path).resolve()
+        if not project_dir.is_dir():
+            raise FileNotFoundError(f"Project directory {project_dir} does not exist")
+        with self._lock:
+            state = self.projects.get(str(project_dir))
+            if state is None:
+                config = Path(config_file or self.config_file or project_dir / "config.yaml")
+                state = self.projects[str(project_dir)] = ProjectState(project_dir, config)
+        return state
+
+    def flush(self):
+        """Write the tree caches whose last changes are still held back; projects being scanned are skipped."""
+        with self._lock:
+            projects = list(self.projects.values())
+        for state in projects:
+            if state.lock.acquire(blocking=False):
+                try:
+                    state.tree_cache.flush()
+                finally:
+                    state.lock.release()
+
+    def _regenerate(self, request: dict) -> dict:
+        """Regenerate a project, or only the focus directories holding the request's ``paths``.
+
+        The first request for a project always regenerates all of it, which
+        is how the daemon learns its focus directories.
+        """
+        if not request.get("project"):
+            raise ValueError("regenerate needs a project")
+        state = self.project(request["project"], request.get("config"))
+        with state.lock:
+            only = None
+            if request.get("paths") and state.focus_dirs is not None:
+                only = state.affected(request["paths"])
+                if not only:
+                    return {"ok": True, "project": str(state.project_dir), "focus_dirs": [], "skipped": True}
+
+            metrics = Metrics()
+            config = load_config(state.config_file, state.project_dir, metrics)
+            cycle = regenerate(state.project_dir, state.project_dir, config, cache=state.tree_cache,
+                               metrics=metrics, only=only, baseline=state.baseline,
+                               rules_cache=state.ignore_rules)
+            state.baseline = cycle.snapshot
+            if only is None:
+                state.focus_dirs = cycle.focus_dirs
+            state.runs += 1
+            state.metrics.merge(metrics.as_dict())
+            state.last = {
+                "timestamp": time.time(),
+                "partial": only is not None,
+                "seconds": round(cycle.seconds, 4),
+                "focus_dirs": [str(d.relative_to(state.project_dir)) for d in cycle.focus_dirs],
+                "files": cycle.stats.as_dict(),
+                "changes": cycle.changes.as_dict() if cycle.changes is not None else None,
+            }
+            return {"ok": True, "project": str(state.project_dir), **state.last}
+
+    def _status(self, request: dict) -> dict:
+        with self._lock:
+            projects = list(self.projects.values())
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "socket": str(self.socket_path),
+            "uptime": round(time.time() - self.started, 1),
+            "projects": [state.as_dict() for state in projects],
+            "schedule": self.scheduler.as_dict() if self.scheduler is not None else None,
+        }
+
+    def _metrics(self, request: dict) -> dict:
+        with self._lock:
+            projects = list(self.projects.values())
+        if request.get("project"):
+            wanted = str(Path(request["project"]).resolve())
+            projects = [state for state in projects if str(state.project_dir) == wanted]
+        return {"ok": True, "projects": {str(state.project_dir): {"runs": state.runs, **state.metrics.as_dict()}
+                                         for state in projects}}
+
+    def _shutdown(self, request: dict) -> dict:
+        if self._server is not None:
+            # shutdown() waits for serve_forever to return, so it cannot run on a handler thread's behalf
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+        return {"ok": True}
+
+    def serve(self):
+        """Listen until a ``shutdown`` request (or Ctrl+C), then write the tree caches and remove the socket.
+
+        Raises ``DaemonError`` if another daemon already listens on the
+        socket or a file of another user is in its place; a socket left
+        behind by a dead daemon is replaced. The ``scheduler``, if any,
+        starts once the socket is bound.
+        """
+        path = self.socket_path
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if os.path.lexists(path):
+            check_socket(path)
+            try:
+                send_request({"cmd": "status"}, path, timeout=1.0)
+            except (DaemonError, OSError, ValueError):
+                path.unlink()
+            else:
+                raise DaemonError(f"A daemon is already listening on {path}")
+
+        # Only this user may connect. The umask is process-wide, so nothing
+        # else may be creating files yet: the scheduler only starts after this
+        old_umask = os.umask(0o077)
+        try:
+            server = _Server(os.fspath(path), _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        server.daemon = self
+        self._server = server
+        try:
+            if self.scheduler is not None:
+                self.scheduler.start()
+            server.serve_forever()
+        finally:
+            if self.scheduler is not None:
+                self.scheduler.stop()
+            server.server_close()
+            self.flush()
+            self._server = None
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    daemon: Daemon
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answers every JSON line received on the connection."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request must be a JSON object")
+            except ValueError as e:
+                response = {"ok": False, "error": f"Invalid request: {e}"}
+            else:
+                response = self.server.daemon.handle(request)
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
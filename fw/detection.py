@@ -0,0 +1,87 @@
+"""Project type detection for a project and the workspace packages nested in it."""
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from fw.ignore import IgnoreMatcher
+from fw.profiles import LANGUAGE_PROFILES
+
+# Subprojects are only looked for when the config sets detect_depth
+DEFAULT_DETECT_DEPTH = 0
+
+def _build_detection_index() -> Dict[str, Tuple[str, ...]]:
+    index: Dict[str, List[str]] = {}
+    for lang, profile in LANGUAGE_PROFILES.items():
+        for name in profile["detection_files"]:
+            index.setdefault(name, [])
+            if lang not in index[name]:
+                index[name].append(lang)
+    return {name: tuple(langs) for name, langs in index.items()}
+
+# Detection file name -> profiles it identifies, in LANGUAGE_PROFILES order
+DETECTION_INDEX = _build_detection_index()
+_PROFILE_ORDER = {lang: i for i, lang in enumerate(LANGUAGE_PROFILES)}
+
+# Dependency and build directories of every profile never hold a subproject of their own
+SKIP_DIRS = tuple(dict.fromkeys(d for profile in LANGUAGE_PROFILES.values() for d in profile["exclude_dirs"]))
+
+def match_detection_files(names: Iterable[str]) -> List[str]:
+    """Profiles identified by any of ``names``, in ``LANGUAGE_PROFILES`` order."""
+    found = set()
+    for name in names:
+        langs = DETECTION_INDEX.get(name)
+        if langs:
+            found.update(langs)
+    return sorted(found, key=_PROFILE_ORDER.__getitem__)
+
+def detect_root_types(project_dir: Path) -> List[str]:
+    """Profiles matched by detection files at the top of ``project_dir``, from a single ``scandir``."""
+    try:
+        with os.scandir(project_dir) as it:
+            return match_detection_files(entry.name for entry in it)
+    except OSError:
+        return []
+
+def scan_subprojects(project_dir: Path, max_depth: int = DEFAULT_DETECT_DEPTH,
+                     exclude_dirs: Iterable[str] = ()) -> Dict[str, List[str]]:
+    """Map every directory up to ``max_depth`` levels below ``project_dir`` that holds
+    detection files to the profiles they identify.
+
+    Keys are ``/``-separated paths relative to ``project_dir``, ``""`` being
+    the root, in breadth-first order. Each directory is listed once with
+    ``os.scandir`` and its file names are looked up in ``DETECTION_INDEX``,
+    so the cost depends on the tree, not on the number of profiles or
+    detection files. Hidden directories, symlinks, ``exclude_dirs``, every
+    profile's dependency directories and gitignored directories are skipped.
+    """
+    matcher = IgnoreMatcher(project_dir, list(exclude_dirs) + list(SKIP_DIRS))
+    root = os.fspath(project_dir)
+    found: Dict[str, List[str]] = {}
+    level = [("", root, matcher.root_rules)]
+    depth = 0
+    while level:
+        next_level = []
+        for dir_rel, dir_path, parent_rules in level:
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            names = [entry.name for entry in entries]
+            langs = match_detection_files(names)
+            if langs:
+                found[dir_rel] = langs
+            if depth >= max_depth:
+                continue
+            rules = matcher.child_rules(parent_rules, dir_rel, ".gitignore" in names)
+            prefix = f"{dir_rel}/" if dir_rel else ""
+            for entry in sorted(entries, key=lambda e: e.name):
+                name = entry.name
+                if name.startswith(".") or not entry.is_dir(follow_symlinks=False):
+                    continue
+                if matcher.excluded_name(name) or rules.ignored(prefix + name, True):
+                    continue
+                next_level.append((prefix + name, entry.path, rules))
+        level = next_level
+        depth += 1
+    return found
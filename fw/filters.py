@@ -0,0 +1,69 @@
+"""Filters compiled once from the config and reused for every directory entry."""
+import os
+from typing import Callable, FrozenSet, Iterable, List
+
+# Below this many extensions one C-level str.endswith over a tuple beats a set lookup
+SUFFIX_INDEX_THRESHOLD = 24
+
+def compile_suffix_matcher(extensions: Iterable[str]) -> Callable[[str], bool]:
+    """Return a predicate equivalent to ``any(name.endswith(ext) for ext in extensions)``.
+
+    Short lists use a single ``str.endswith`` over a tuple. Past
+    ``SUFFIX_INDEX_THRESHOLD`` entries, extensions starting with a dot are
+    looked up in a set by slicing the name at its last dots, one slice per
+    dot in the longest extension, so the cost no longer grows with the list.
+    Anything else (``Makefile``, ``rc``) still goes through ``str.endswith``.
+    """
+    extensions = tuple(extensions)
+    if len(extensions) < SUFFIX_INDEX_THRESHOLD:
+        return lambda name: name.endswith(extensions)
+    dotted = frozenset(ext for ext in extensions if ext.startswith("."))
+    other = tuple(ext for ext in extensions if ext and not ext.startswith("."))
+    if "" in extensions:
+        return lambda name: True
+    depth = max((ext.count(".") for ext in dotted), default=0)
+
+    if depth == 1 and not other:
+        def matches(name: str) -> bool:
+            i = name.rfind(".")
+            return i >= 0 and name[i:] in dotted
+        return matches
+
+    def matches(name: str) -> bool:
+        if other and name.endswith(other):
+            return True
+        i = len(name)
+        for _ in range(depth):
+            i = name.rfind(".", 0, i)
+            if i < 0:
+                return False
+            if name[i:] in dotted:
+                return True
+        return False
+    return matches
+
+def config_path_prefixes(config_paths: Iterable[str]) -> FrozenSet[str]:
+    """Every proper ancestor directory of ``config_paths``, which are ``os.sep``-separated.
+
+    ``rel_path in config_path_prefixes(paths)`` is a hash lookup equivalent to
+    ``any(cp.startswith(rel_path + os.sep) for cp in paths)``, so ``src``
+    covers ``src/app`` but not ``src2``.
+    """
+    return frozenset(ancestor for cp in config_paths for ancestor in _ancestors(cp))
+
+def covering_dirs(rel_paths: Iterable[str]) -> List[str]:
+    """The ``rel_paths`` not nested in another one, in their original order.
+
+    Paths are relative and ``os.sep``-separated; ``.`` contains everything.
+    """
+    rel_paths = list(dict.fromkeys(rel_paths))
+    if "." in rel_paths:
+        return ["."]
+    wanted = set(rel_paths)
+    return [rel for rel in rel_paths if not any(ancestor in wanted for ancestor in _ancestors(rel))]
+
+def _ancestors(rel_path: str) -> Iterable[str]:
+    end = rel_path.find(os.sep)
+    while end > 0:
+        yield rel_path[:end]
+        end = rel_path.find(os.sep, end + 1)
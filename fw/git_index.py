@@ -0,0 +1,192 @@
+"""Directory listings built from a repository's ``.git/index`` instead of the working tree."""
+import os
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+INDEX_SIGNATURE = b"DIRC"
+SUPPORTED_VERSIONS = (2, 3, 4)
+# Extension of a split index, whose entries mostly live in a separate shared index file
+SPLIT_INDEX_EXTENSION = b"link"
+
+# Offsets within a cache entry; ctime, mtime, dev, ino, mode, uid, gid and size come first
+_ENTRY_FIXED = 62
+_MODE_OFFSET = 24
+_FLAGS_OFFSET = 60
+_FLAG_EXTENDED = 0x4000
+_FLAG_STAGE = 0x3000
+_NAME_MASK = 0x0FFF
+_EXTENDED_SKIP_WORKTREE = 0x4000
+_MODE_TYPE = 0o170000
+_MODE_GITLINK = 0o160000
+_MODE_DIR = 0o040000
+
+class GitIndexError(ValueError):
+    pass
+
+def find_git_dir(start: Path) -> Optional[Tuple[Path, Path]]:
+    """``(work_tree, git_dir)`` of the repository containing ``start``, or None.
+
+    Follows ``gitdir:`` files as used by worktrees and submodules.
+    """
+    path = Path(os.path.abspath(start))
+    for candidate in (path, *path.parents):
+        dot_git = candidate / ".git"
+        if dot_git.is_dir():
+            return candidate, dot_git
+        if dot_git.is_file():
+            try:
+                with open(dot_git, 'r', encoding='utf-8') as f:
+                    line = f.readline().strip()
+            except OSError:
+                return None
+            if line.startswith("gitdir:"):
+                git_dir = Path(line[len("gitdir:"):].strip())
+                return candidate, git_dir if git_dir.is_absolute() else (candidate / git_dir).resolve()
+            return None
+    return None
+
+def read_index(index_file: Path) -> List[Tuple[str, int]]:
+    """``(path, mode)`` of every stage-0 entry in a git index file, in index order.
+
+    Supports index versions 2 to 4 (including v4 path compression). Entries
+    marked skip-worktree, which are absent from the working tree, are left out.
+    Raises ``GitIndexError`` for a split index (``core.splitIndex``), whose
+    entries are only partly in ``index_file``.
+    """
+    with open(index_file, 'rb') as f:
+        data = f.read()
+    if len(data) < 12 or data[:4] != INDEX_SIGNATURE:
+        raise GitIndexError(f"{index_file} is not a git index")
+    version, count = struct.unpack_from(">II", data, 4)
+    if version not in SUPPORTED_VERSIONS:
+        raise GitIndexError(f"unsupported git index version {version}")
+
+    entries = []
+    unpack_mode = struct.Struct(">I").unpack_from
+    unpack_flags = struct.Struct(">H").unpack_from
+    pos = 12
+    previous = b""
+    for _ in range(count):
+        start = pos
+        (mode,) = unpack_mode(data, pos + _MODE_OFFSET)
+        (flags,) = unpack_flags(data, pos + _FLAGS_OFFSET)
+        pos += _ENTRY_FIXED
+        skip = False
+        if flags & _FLAG_EXTENDED:
+            (extended,) = unpack_flags(data, pos)
+            skip = bool(extended & _EXTENDED_SKIP_WORKTREE)
+            pos += 2
+
+        if version == 4:
+            # Strip N bytes off the previous path, then append the NUL-terminated suffix
+            strip, pos = _read_offset_varint(data, pos)
+            end = data.index(b"\0", pos)
+            path = previous[:len(previous) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            length = flags & _NAME_MASK
+            end = pos + length if length < _NAME_MASK else data.index(b"\0", pos)
+            path = data[pos:end]
+            # Entries are NUL-padded to a multiple of eight bytes
+            pos = start + ((end - start + 8) & ~7)
+        previous = path
+
+        if skip or flags & _FLAG_STAGE:
+            continue
+        entries.append((path.decode("utf-8", "surrogateescape"), mode))
+
+    # Extensions follow the entries: a 4-byte signature and a 4-byte size each,
+    # then the trailing checksum (20 bytes for SHA-1, 32 for SHA-256)
+    while pos + 8 <= len(data) - 20:
+        signature = data[pos:pos + 4]
+        (size,) = unpack_mode(data, pos + 4)
+        if signature == SPLIT_INDEX_EXTENSION:
+            raise GitIndexError(f"{index_file} is a split index")
+        pos += 8 + size
+    return entries
+
+def _read_offset_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+class GitIndexTree:
+    """Listings of every directory below ``root`` that holds tracked files.
+
+    ``listing(dir_key)`` returns ``(name, is_dir)`` children in the tree
+    generator's order, files first, then by name. Submodules appear as
+    empty directories and symlinks as files.
+    """
+
+    __slots__ = ("index_file", "_children", "_sorted")
+
+    def __init__(self, index_file: Path, entries: List[Tuple[str, int]], prefix: str = ""):
+        self.index_file = index_file
+        self._children: Dict[str, Dict[str, bool]] = {"": {}}
+        self._sorted: Dict[str, List[Tuple[str, bool]]] = {}
+        children = self._children
+        for path, mode in entries:
+            if prefix:
+                if not path.startswith(prefix):
+                    continue
+                path = path[len(prefix):]
+            kind = mode & _MODE_TYPE
+            is_dir = kind == _MODE_GITLINK or kind == _MODE_DIR
+            parent, _, name = path.rpartition("/")
+            if name in children.setdefault(parent, {}):
+                continue
+            children[parent][name] = is_dir
+            # Register the missing ancestors of ``parent`` as directories
+            while parent:
+                grandparent, _, dir_name = parent.rpartition("/")
+                siblings = children.setdefault(grandparent, {})
+                if siblings.get(dir_name):
+                    break
+                siblings[dir_name] = True
+                parent = grandparent
+
+    def listing(self, dir_key: str) -> List[Tuple[str, bool]]:
+        result = self._sorted.get(dir_key)
+        if result is None:
+            children = self._children.get(dir_key, {})
+            result = self._sorted[dir_key] = sorted(children.items(), key=_listing_sort_key)
+        return result
+
+def _listing_sort_key(item: Tuple[str, bool]):
+    name, is_dir = item
+    return (is_dir, name)
+
+# Parsed indexes (None for unreadable ones), reused while the index file is unchanged
+_index_memo: Dict[Tuple[str, str], Tuple[Tuple[int, int], Optional[GitIndexTree]]] = {}
+
+def load_index_tree(project_root: Path) -> Optional[GitIndexTree]:
+    """The tracked tree below ``project_root``, or None if it is not in a git repository
+    or its index cannot be read (including split indexes)."""
+    found = find_git_dir(project_root)
+    if found is None:
+        return None
+    work_tree, git_dir = found
+    index_file = git_dir / "index"
+    try:
+        st = os.stat(index_file)
+    except OSError:
+        return None
+    rel = os.path.relpath(os.path.abspath(project_root), work_tree)
+    prefix = "" if rel == "." else rel.replace(os.sep, "/") + "/"
+    key = (os.fspath(index_file), prefix)
+    state = (st.st_mtime_ns, st.st_size)
+    memo = _index_memo.get(key)
+    if memo is not None and memo[0] == state:
+        return memo[1]
+    try:
+        tree = GitIndexTree(index_file, read_index(index_file), prefix)
+    except (OSError, GitIndexError, struct.error, IndexError, ValueError):
+        tree = None
+    _index_memo[key] = (state, tree)
+    return tree
@@ -0,0 +1,235 @@
+"""Compiled gitignore matching with nested .gitignore support."""
+import fnmatch
+import hashlib
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fw.tree_cache import RACY_WINDOW_NS
+
+# Compiled rules kept across matchers by long-running callers: the directory's
+# root-relative path mapped to its parent's fingerprint, the state of its ignore
+# files and the rules compiled from them
+RulesCache = Dict[str, Tuple[str, tuple, "DirRules"]]
+
+def translate_pattern(pattern: str, base: str) -> Optional[Tuple[str, bool, bool]]:
+    """Translate one gitignore line into ``(regex, negate, dir_only)``.
+
+    The regex matches paths relative to the project root, using ``/`` as the
+    separator; ``base`` is the root-relative directory of the ignore file
+    (``""`` for the root). Returns ``None`` for blank lines and comments.
+    """
+    if pattern.endswith("\n"):
+        pattern = pattern[:-1]
+    # Trailing spaces are ignored unless escaped
+    stripped = pattern.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(pattern):
+        stripped += " "
+    pattern = stripped
+    if not pattern or pattern.startswith("#"):
+        return None
+
+    negate = pattern.startswith("!")
+    if negate:
+        pattern = pattern[1:]
+    elif pattern.startswith("\\!") or pattern.startswith("\\#"):
+        pattern = pattern[1:]
+
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    if not pattern:
+        return None
+
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i):
+                at_start = i == 0 or pattern[i - 1] == "/"
+                after = i + 2
+                if at_start and after < n and pattern[after] == "/":
+                    out.append("(?:.*/)?")
+                    i = after + 1
+                    continue
+                if at_start and after == n:
+                    out.append(".*")
+                    i = after
+                    continue
+            out.append("[^/]*")
+            while i < n and pattern[i] == "*":
+                i += 1
+            continue
+        if c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = i + 1
+            if j < n and pattern[j] in "!^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j]
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+
+    prefix = re.escape(base + "/") if base else ""
+    if not anchored:
+        prefix += "(?:.*/)?"
+    return prefix + "".join(out), negate, dir_only
+
+class DirRules:
+    """The ignore rules in effect for the entries of one directory.
+
+    All rules from the root down to this directory are compiled into one
+    alternation in reverse priority order, so a single ``match`` finds the
+    last matching rule and its group index tells whether it was a negation.
+    """
+
+    __slots__ = ("rules", "fingerprint", "_dir_regex", "_file_regex", "_dir_negate", "_file_negate")
+
+    def __init__(self, rules: List[Tuple[str, bool, bool]], fingerprint: str):
+        self.rules = rules
+        self.fingerprint = fingerprint
+        self._dir_regex, self._dir_negate = self._compile(rules)
+        self._file_regex, self._file_negate = self._compile([r for r in rules if not r[2]])
+
+    @staticmethod
+    def _compile(rules):
+        if not rules:
+            return None, ()
+        ordered = rules[::-1]
+        regex = re.compile("(?:" + "|".join(f"({r[0]})" for r in ordered) + r")\Z", re.DOTALL)
+        return regex, tuple(r[1] for r in ordered)
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """Whether the root-relative, ``/``-separated ``rel_path`` is ignored."""
+        regex, negate = (self._dir_regex, self._dir_negate) if is_dir else (self._file_regex, self._file_negate)
+        if regex is None:
+            return False
+        m = regex.match(rel_path)
+        return m is not None and not negate[m.lastindex - 1]
+
+def _sources_state(sources: List[str]) -> Optional[tuple]:
+    """``(mtime_ns, size)`` of each ignore file (None if missing), or None if one was modified too recently to trust."""
+    state = []
+    now = time.time_ns()
+    for source in sources:
+        try:
+            st = os.stat(source)
+        except OSError:
+            state.append(None)
+            continue
+        if now - st.st_mtime_ns < RACY_WINDOW_NS:
+            return None
+        state.append((st.st_mtime_ns, st.st_size))
+    return tuple(state)
+
+class IgnoreMatcher:
+    """Ignore decisions for a project: ``exclude_dirs`` globs, ``.git/info/exclude`` and every ``.gitignore``.
+
+    Rules are compiled once per directory that carries a ``.gitignore``;
+    directories without one share their parent's compiled rules. With a
+    ``rules_cache`` shared between matchers, an ignore file whose mtime and
+    size are unchanged is not read or compiled again.
+    """
+
+    def __init__(self, project_root: Path, exclude_dirs: Iterable[str] = (),
+                 rules_cache: Optional[RulesCache] = None):
+        self.project_root = os.path.abspath(project_root)
+        self.rules_cache = rules_cache
+        exclude_dirs = list(exclude_dirs)
+        self.exclude_names = frozenset(exclude_dirs)
+        globs = [fnmatch.translate(e) for e in exclude_dirs if any(c in e for c in "*?[")]
+        self._exclude_regex = re.compile("|".join(globs)) if globs else None
+        self._memo: Dict[str, DirRules] = {}
+
+        sources = [os.path.join(self.project_root, ".git", "info", "exclude"),
+                   os.path.join(self.project_root, ".gitignore")]
+        self.root_rules = self._extend(DirRules([], ""), "", sources)
+        self._memo[""] = self.root_rules
+
+    def _extend(self, parent: DirRules, base: str, sources: List[str]) -> DirRules:
+        state = _sources_state(sources) if self.rules_cache is not None else None
+        if state is not None:
+            cached = self.rules_cache.get(base)
+            if cached is not None and cached[0] == parent.fingerprint and cached[1] == state:
+                return cached[2]
+        result = self._compile_sources(parent, base, sources)
+        if state is not None:
+            self.rules_cache[base] = (parent.fingerprint, state, result)
+        return result
+
+    def _compile_sources(self, parent: DirRules, base: str, sources: List[str]) -> DirRules:
+        rules = list(parent.rules)
+        h = hashlib.sha1(parent.fingerprint.encode("ascii"))
+        for source in sources:
+            try:
+                with open(source, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                continue
+            h.update(source.encode("utf-8", "surrogateescape") + b"\0" + data)
+            for line in data.decode("utf-8", "replace").splitlines():
+                rule = translate_pattern(line, base)
+                if rule is not None:
+                    rules.append(rule)
+        if len(rules) == len(parent.rules) and parent.fingerprint:
+            return parent
+        return DirRules(rules, h.hexdigest())
+
+    def child_rules(self, parent: DirRules, dir_rel: str, has_gitignore: bool) -> DirRules:
+        """Rules for the entries of ``dir_rel`` given its parent's rules and whether it has a ``.gitignore``."""
+        if not has_gitignore or not dir_rel:
+            return parent
+        rules = self._memo.get(dir_rel)
+        if rules is None:
+            rules = self._extend(parent, dir_rel, [os.path.join(self.project_root, dir_rel, ".gitignore")])
+            self._memo[dir_rel] = rules
+        return rules
+
+    def rules_for(self, dir_rel: str) -> DirRules:
+        """Rules for the entries of ``dir_rel``, checking every ancestor for a ``.gitignore``."""
+        rules = self._memo.get(dir_rel)
+        if rules is not None:
+            return rules
+        parent_rel = dir_rel.rpartition("/")[0]
+        parent = self.rules_for(parent_rel)
+        has_gitignore = os.path.isfile(os.path.join(self.project_root, dir_rel, ".gitignore"))
+        rules = self.child_rules(parent, dir_rel, has_gitignore)
+        self._memo[dir_rel] = rules
+        return rules
+
+    def excluded_name(self, name: str) -> bool:
+        """Whether a directory name is listed in ``exclude_dirs``, directly or as a glob."""
+        return name in self.exclude_names or (self._exclude_regex is not None and
+                                              self._exclude_regex.match(name) is not None)
+
+    def __call__(self, path) -> bool:
+        """Whether ``path`` (absolute or relative to the cwd) is ignored."""
+        rel = os.path.relpath(os.path.abspath(path), self.project_root)
+        if rel == "." or rel.startswith(".."):
+            return False
+        rel = rel.replace(os.sep, "/")
+        parent_rel, _, name = rel.rpartition("/")
+        is_dir = os.path.isdir(path)
+        if is_dir and self.excluded_name(name):
+            return True
+        return self.rules_for(parent_rel).ignored(rel, is_dir)
@@ -0,0 +1,61 @@
+"""Per-stage timers and counters for profiling agent generation."""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+class Metrics:
+    """Accumulated stage timings (seconds) and event counters for one run.
+
+    Stage names are dotted, ``tree.list`` being part of ``tree``. Timings
+    recorded from worker threads are summed, so a sub-stage can add up to
+    more than the wall time of its parent. Safe to share between threads.
+    """
+
+    __slots__ = ("timers", "counters", "_lock")
+
+    def __init__(self):
+        self.timers: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other: dict):
+        """Add the timers and counters of another run's ``as_dict()``."""
+        for name, seconds in other.get("timers", {}).items():
+            self.add_time(name, seconds)
+        for name, n in other.get("counters", {}).items():
+            self.count(name, n)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "timers": {name: round(seconds, 6) for name, seconds in self.timers.items()},
+                "counters": dict(self.counters),
+            }
+
+def append_metrics_log(log_file: Path, record: dict, metrics: Optional[Metrics] = None):
+    """Append ``record`` (plus ``metrics``, if given) to a JSONL log as one line."""
+    if metrics is not None:
+        record = dict(record, **metrics.as_dict())
+    log_file = Path(log_file)
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
@@ -0,0 +1,108 @@
+"""Atomic, change-aware writes for generated files."""
+import os
+from pathlib import Path
+from typing import Iterable, Optional
+
+class OutputStats:
+    """Counts of files written, left untouched and removed during one run, and the bytes written."""
+
+    __slots__ = ("written", "skipped", "removed", "bytes_written")
+
+    def __init__(self):
+        self.written = 0
+        self.skipped = 0
+        self.removed = 0
+        self.bytes_written = 0
+
+    def as_dict(self) -> dict:
+        return {"written": self.written, "skipped": self.skipped, "removed": self.removed,
+                "bytes_written": self.bytes_written}
+
+    def __str__(self):
+        return f"{self.written} written, {self.skipped} unchanged, {self.removed} removed"
+
+def write_if_changed(path: Path, content: str, stats: Optional[OutputStats] = None) -> bool:
+    """Write ``content`` to ``path`` only if it differs from what is there, atomically."""
+    return write_chunks_if_changed(path, (content,), stats)
+
+def write_chunks_if_changed(path: Path, chunks: Iterable[str], stats: Optional[OutputStats] = None) -> bool:
+    """Stream ``chunks`` into ``path``, touching the file only if the result differs.
+
+    Each chunk is compared with the matching bytes of the existing file as it
+    arrives, so neither version is held in memory. On the first difference a
+    temporary file is opened in the same directory, seeded with the prefix
+    that matched and renamed over ``path`` once the stream ends. An unchanged
+    file is never written and keeps its mtime. Returns whether it was written.
+    """
+    path = Path(path)
+    try:
+        existing = open(path, 'rb')
+    except OSError:
+        existing = None
+    out = tmp_path = None
+    matched = size = 0
+    try:
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            size += len(data)
+            if out is None and existing is not None:
+                if existing.read(len(data)) == data:
+                    matched += len(data)
+                    continue
+            if out is None:
+                out, tmp_path = _open_temp(path, existing, matched)
+            out.write(data)
+
+        if out is None:
+            if existing is not None and not existing.read(1):
+                if stats is not None:
+                    stats.skipped += 1
+                return False
+            out, tmp_path = _open_temp(path, existing, matched)
+
+        out.close()
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            # A new file keeps the mode it was created with, 0o666 less the umask
+            pass
+        os.replace(tmp_path, path)
+        tmp_path = None
+    finally:
+        if existing is not None:
+            existing.close()
+        if out is not None:
+            out.close()
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+    if stats is not None:
+        stats.written += 1
+        stats.bytes_written += size
+    return True
+
+def _open_temp(path: Path, existing, matched: int):
+    """Open a temporary sibling of ``path`` holding the first ``matched`` bytes of ``existing``."""
+    # Not mkstemp: its 0o600 would have to be widened by hand, and reading the
+    # umask means changing it for every thread of the process
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    for _ in range(100):
+        tmp_path = os.path.join(path.parent, f".{path.name}.{os.urandom(4).hex()}.tmp")
+        try:
+            fd = os.open(tmp_path, flags, 0o666)
+        except FileExistsError:
+            continue
+        break
+    else:
+        raise FileExistsError(f"No free temporary name for {path}")
+    out = os.fdopen(fd, 'wb')
+    if matched:
+        existing.seek(0)
+        remaining = matched
+        while remaining:
+            block = existing.read(min(remaining, 1 << 16))
+            out.write(block)
+            remaining -= len(block)
+    return out, tmp_path
@@ -0,0 +1,215 @@
+"""Concurrent scan, render and write stages for agent generation.
+
+Each focus directory flows through three stages connected by bounded
+queues:
+
+- scan hands its tree to the thread pool of ``workers`` threads, which
+  walks it as the writer asks for lines (with several workers, one task
+  per top-level subdirectory), and summarizes its files on the same pool
+  once the walk is done, if a summarizer is given;
+- render names the agent (and tree file) and queues its content as a
+  stream of chunks;
+- write streams the chunks onto disk with ``write_chunks_if_changed``,
+  from a separate pool of ``io_workers`` threads.
+
+An agent file lands as soon as its own tree is done, writes overlap with
+the remaining scans, and a slow filesystem stalls only the writer it is
+blocking. Lines move from the walk to the file in small batches through
+bounded queues, so neither trees nor agent content are ever held whole in
+memory. With ``save_trees`` the tree file is written first and the agent
+reads its tree back from it.
+"""
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from fw.agent_generator import TREES_DIR, render_agent, tree_file_path
+from fw.metrics import Metrics
+from fw.output import OutputStats, write_chunks_if_changed
+from fw.project_tree_generator import FocusTree
+from fw.tree_cache import default_cache_dir
+
+DEFAULT_IO_WORKERS = 4
+QUEUE_SIZE = 8
+
+def run_agent_pipeline(project_dir: Path, focus_dirs: Sequence[str], trees: Dict[str, Iterable[str]],
+                       save_trees: bool = False, stats: Optional[OutputStats] = None,
+                       metrics: Optional[Metrics] = None, workers: int = 1,
+                       io_workers: int = DEFAULT_IO_WORKERS,
+                       summarize: Optional[Callable[[str], List[Tuple[str, List[str]]]]] = None) -> Set[str]:
+    """Walk ``trees`` and write the agent file (and, with ``save_trees``, the tree file) of
+    every focus directory, returning the agent file names.
+
+    ``focus_dirs`` are relative to ``project_dir``. Trees should be
+    ``FocusTree``s so the walk happens in the scan stage; other iterables
+    are consumed by the writer. ``summarize`` maps a focus directory to the
+    file summaries of its agent, once its tree is walked. An error while
+    walking aborts the run once the pipeline drains; a failed summary or
+    write only leaves that part out. Agents that failed to render or write
+    (including those whose tree file could not be written) are still
+    returned, so ``remove_stale_agents`` keeps their previous files. Stage
+    times recorded in ``metrics`` are summed over threads.
+    """
+    if save_trees:
+        (default_cache_dir(project_dir) / TREES_DIR).mkdir(parents=True, exist_ok=True)
+    pipeline = _Pipeline(project_dir, save_trees, stats if stats is not None else OutputStats(), metrics, summarize)
+    jobs = [str(Path(d)) for d in focus_dirs]
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="fw-scan") as scan_pool, \
+            ThreadPoolExecutor(max_workers=max(io_workers, 1), thread_name_prefix="fw-write") as io_pool:
+        asyncio.run(pipeline.run(jobs, trees, scan_pool, io_pool, max(workers, 1), max(io_workers, 1)))
+    if pipeline.walk_error is not None:
+        raise pipeline.walk_error
+    if metrics is not None:
+        metrics.count("agents", len(pipeline.created))
+        metrics.count("agents_failed", len(pipeline.failed))
+    return pipeline.created | pipeline.failed
+
+class _Pipeline:
+    def __init__(self, project_dir: Path, save_trees: bool, stats: OutputStats, metrics: Optional[Metrics],
+                 summarize: Optional[Callable[[str], List[Tuple[str, List[str]]]]] = None):
+        self.project_dir = project_dir
+        self.save_trees = save_trees
+        self.stats = stats
+        self.metrics = metrics
+        self.summarize = summarize
+        self.created: Set[str] = set()
+        # Agents whose focus directory still exists but whose new version could not be written
+        self.failed: Set[str] = set()
+        # The first exception raised by a walk, re-raised once the pipeline drains
+        self.walk_error: Optional[Exception] = None
+
+    async def run(self, jobs: List[str], trees: Dict[str, Iterable[str]], scan_pool, io_pool,
+                  workers: int, io_workers: int):
+        loop = asyncio.get_running_loop()
+        render_queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+        write_queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+
+        async def scan_all():
+            try:
+                for rel_dir in jobs:
+                    tree = trees.get(rel_dir, ())
+                    # Nothing is walked until a writer starts reading the stream
+                    lines = self._walk(tree.stream(scan_pool.submit, workers) if isinstance(tree, FocusTree)
+                                       else tree)
+                    summaries = None
+                    if self.summarize is not None:
+                        summaries = functools.partial(self._summarize, scan_pool, rel_dir)
+                    await render_queue.put((rel_dir, lines, summaries))
+            finally:
+                await render_queue.put(None)
+
+        async def render():
+            claimed = set()
+            try:
+                while True:
+                    item = await render_queue.get()
+                    if item is None:
+                        return
+                    rel_dir, lines, summaries = item
+                    tree_path = tree_file_path(self.project_dir, rel_dir) if self.save_trees else None
+                    agent_name = chunks = None
+                    try:
+                        agent_name, chunks = render_agent(rel_dir, lines if tree_path is None
+                                                          else _read_tree_file(tree_path), summaries)
+                    except Exception:
+                        pass
+                    if agent_name in claimed:
+                        agent_name = chunks = None
+                    elif agent_name is not None:
+                        claimed.add(agent_name)
+                    # Trees without an agent are still walked, for their tree file and listings
+                    await write_queue.put((agent_name, chunks, tree_path, lines))
+            finally:
+                for _ in range(io_workers):
+                    await write_queue.put(None)
+
+        async def write():
+            while True:
+                item = await write_queue.get()
+                if item is None:
+                    return
+                agent_name = item[0]
+                file_stats = OutputStats()
+                try:
+                    await loop.run_in_executor(io_pool, self._write_focus, *item, file_stats)
+                except Exception:
+                    if agent_name is not None:
+                        self.failed.add(agent_name)
+                    continue
+                finally:
+                    self._add_stats(file_stats)
+                if agent_name is not None:
+                    self.created.add(agent_name)
+
+        await asyncio.gather(scan_all(), render(), *(write() for _ in range(io_workers)))
+
+    def _write_focus(self, agent_name: Optional[str], chunks: Optional[Iterable[str]], tree_path: Optional[Path],
+                     lines: Iterator[str], file_stats: OutputStats):
+        """Write the tree file and agent of one focus directory, walking its tree as they are written."""
+        try:
+            if tree_path is not None:
+                self._write(tree_path, _joined(lines), file_stats)
+            if agent_name is not None:
+                self._write(self.project_dir / agent_name, chunks, file_stats)
+            elif tree_path is None:
+                for _ in lines:
+                    pass
+        finally:
+            lines.close()
+
+    def _walk(self, lines: Iterable[str]) -> Iterator[str]:
+        count = 0
+        try:
+            for line in lines:
+                count += 1
+                yield line
+        except Exception as e:
+            if self.walk_error is None:
+                self.walk_error = e
+            raise
+        finally:
+            close = getattr(lines, "close", None)
+            if close is not None:
+                close()
+        if self.metrics is not None:
+            self.metrics.count("trees")
+            self.metrics.count("tree_lines", count)
+
+    def _summarize(self, scan_pool, rel_dir: str):
+        # On the scan pool, so summaries count against ``workers`` like the walks
+        try:
+            return scan_pool.submit(self.summarize, rel_dir).result()
+        except Exception:
+            return None
+
+    def _write(self, path: Path, chunks: Iterable[str], file_stats: OutputStats):
+        started = time.perf_counter()
+        try:
+            write_chunks_if_changed(path, chunks, file_stats)
+        finally:
+            if self.metrics is not None:
+                self.metrics.add_time("write", time.perf_counter() - started)
+
+    def _add_stats(self, file_stats: OutputStats):
+        # Runs on the event loop, so the shared counters are never updated concurrently
+        self.stats.written += file_stats.written
+        self.stats.skipped += file_stats.skipped
+        self.stats.bytes_written += file_stats.bytes_written
+        if self.metrics is not None:
+            self.metrics.count("bytes_written", file_stats.bytes_written)
+
+def _joined(lines: Iterable[str]) -> Iterator[str]:
+    """``lines`` joined by newlines, as chunks."""
+    separator = ""
+    for line in lines:
+        yield separator + line
+        separator = "\n"
+
+def _read_tree_file(path: Path) -> Iterator[str]:
+    """The lines of a tree file written from ``_joined``, read lazily."""
+    with open(path, 'r', encoding='utf-8', newline='\n') as f:
+        for line in f:
+            yield line[:-1] if line.endswith("\n") else line
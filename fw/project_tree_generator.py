@@ -1,50 +1,429 @@
+import hashlib
+import functools
+import heapq
+import os
+import queue
+import threading
+import time
 from pathlib import Path
-from gitignore_parser import parse_gitignore
+from typing import Callable, Collection, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fw.config_loader import CompiledConfig, subproject_configs
+from fw.filters import compile_suffix_matcher, config_path_prefixes, covering_dirs
+from fw.git_index import GitIndexTree, load_index_tree
+from fw.ignore import DirRules, IgnoreMatcher, RulesCache
+from fw.metrics import Metrics
+from fw.tree_cache import TreeCache
+from fw.tree_model import TreeRecorder, TreeSnapshot
+
+# Keep generated trees small enough to embed in an LLM prompt
+DEFAULT_MAX_ENTRIES_PER_DIR = 500
+DEFAULT_MAX_TREE_BYTES = 200_000
+# Past this many matching entries a directory only keeps the ones it can show
+HUGE_DIR_ENTRIES = 10_000
+# Per-scan budgets, so one runaway directory cannot stall recurring mode
+DEFAULT_MAX_SCAN_ENTRIES = 5_000_000
+DEFAULT_MAX_SCAN_SECONDS = 300
+# "inside" follows directory symlinks that resolve within the project root
+FOLLOW_SYMLINK_POLICIES = ("inside", "always", "never")
+# ``is_dir`` value of a kept entry that is a symlink to a directory
+LINKED_DIR = 2
+# A streamed walk hands its lines to the consumer in batches of this many,
+# with at most this many batches waiting
+STREAM_BATCH_LINES = 256
+STREAM_QUEUE_BATCHES = 4
 
 class ProjectTreeGenerator:
-    def __init__(self, project_root: Path, config_dir: Path, config: dict):
+    def __init__(self, project_root: Path, config_dir: Path, config: dict, cache: Optional[TreeCache] = None,
+                 metrics: Optional[Metrics] = None, rules_cache: Optional[RulesCache] = None):
         self.project_root = project_root
         self.config_dir = config_dir
+        self.cache = cache
+        self.metrics = metrics
         self.include_extensions = set(config.get("include_extensions", []))
         self.important_dirs = set(config.get("important_dirs", []))
         self.exclude_dirs = set(config.get("exclude_dirs", []))
-
-        gitignore_path = project_root / ".gitignore"
-        if gitignore_path.exists():
-            self.matches = parse_gitignore(gitignore_path)
+        if isinstance(config, CompiledConfig):
+            self._has_extension = config.has_extension
         else:
-            temp_ignore = project_root / ".temp_gitignore"
-            with open(temp_ignore, 'w', encoding='utf-8') as f:
-                for e in self.exclude_dirs:
-                    f.write(f"{e}/\n")
-            self.matches = parse_gitignore(temp_ignore)
-            temp_ignore.unlink()
+            self._has_extension = compile_suffix_matcher(self.include_extensions)
+        self._prefix_index: Dict[FrozenSet[str], FrozenSet[str]] = {}
+        # Every directory listed so far, shared by all trees rendered by this generator
+        self.listings: Dict[str, Tuple[int, list, DirRules]] = {}
+        self._listing_locks: Dict[str, threading.Lock] = {}
+        self._listing_locks_guard = threading.Lock()
+        self.max_entries_per_dir = config.get("max_entries_per_dir", DEFAULT_MAX_ENTRIES_PER_DIR)
+        self.max_tree_lines = config.get("max_tree_lines")
+        self.max_tree_bytes = config.get("max_tree_bytes", DEFAULT_MAX_TREE_BYTES)
+        self.follow_symlinks = config.get("follow_symlinks", "inside")
+        if self.follow_symlinks not in FOLLOW_SYMLINK_POLICIES:
+            raise ValueError(f"follow_symlinks must be one of {', '.join(FOLLOW_SYMLINK_POLICIES)}")
+        self.max_scan_entries = config.get("max_scan_entries", DEFAULT_MAX_SCAN_ENTRIES)
+        self.max_scan_seconds = config.get("max_scan_seconds", DEFAULT_MAX_SCAN_SECONDS)
+        self._scan_entries = 0
+        self._scan_deadline: Optional[float] = None
+        self._real_root: Optional[str] = None
+        self._dir_ids: Dict[str, Tuple[int, int]] = {}
+
+        self.matches = IgnoreMatcher(project_root, self.exclude_dirs, rules_cache)
+
+        # Falls back to scandir outside a git repository or if the index cannot be read
+        self.index: Optional[GitIndexTree] = None
+        self.git_untracked = bool(config.get("git_untracked", False))
+        if config.get("tree_backend", "scandir") == "git":
+            self.index = load_index_tree(project_root)
+        if self.index is not None:
+            # Listings come from the index, so there is nothing to cache
+            self.cache = None
+
+        if self.cache is not None:
+            self.cache.reset(self.filter_signature())
+
+    def filter_signature(self) -> str:
+        """Hash of the configured filters; ignore files are tracked per directory by the cache."""
+        h = hashlib.sha1()
+        for values in (self.exclude_dirs, self.include_extensions):
+            h.update("\0".join(sorted(values)).encode("utf-8"))
+            h.update(b"\1")
+        return h.hexdigest()
+
+    def iter_tree(self, directory: Path, max_depth: int = 3, config_paths: set = None) -> Iterator[str]:
+        """Yield the tree below ``directory`` line by line.
+
+        Each directory is listed once with ``os.scandir`` and the cached
+        ``DirEntry`` type information is reused for sorting and filtering.
+        Directories at ``max_depth`` are printed but never listed. Lines stop
+        once the output budget is spent, and since the walk is lazy nothing
+        past that point is ever scanned.
+        """
+        if max_depth < 0:
+            return iter(())
+        root_rel = str(Path(directory).relative_to(self.project_root))
+        root_rel = "" if root_rel == "." else root_rel
+        lines = self._iter_dir(os.fspath(directory), root_rel, "", 0, max_depth,
+                               self._config_prefixes(config_paths), self._parent_rules(root_rel))
+        return self._apply_budget(lines)
 
     def generate_tree(self, directory: Path, max_depth: int = 3, config_paths: set = None):
-        tree_lines = []
+        """Render the tree below ``directory`` as a list of lines."""
+        return list(self.iter_tree(directory, max_depth, config_paths))
+
+    def generate_focus_trees(self, focus_dirs: Sequence[Path], max_depth: int = 3,
+                             config_paths: set = None) -> Dict[str, "FocusTree"]:
+        """Unwalked trees of the focus directories, keyed by path relative to the project root.
 
-        def _generate(dir_path: Path, prefix: str = "", depth: int = 0):
-            if depth > max_depth:
+        The trees are ``FocusTree``s, so the walk happens wherever they are
+        consumed (the scan stage of ``run_agent_pipeline``). The outermost
+        focus directories come first; those nested in them follow and are
+        rendered from the listings their scan already made, so every
+        directory is listed once.
+        """
+        by_rel = {}
+        for focus_dir in focus_dirs:
+            by_rel.setdefault(str(focus_dir.relative_to(self.project_root)), focus_dir)
+        roots = covering_dirs(by_rel)
+        to_process = [by_rel[rel] for rel in dict.fromkeys(roots + list(by_rel))]
+        if self.metrics is not None:
+            self.metrics.count("scan_roots", len(roots))
+        return {str(d.relative_to(self.project_root)): FocusTree(self, d, max_depth, config_paths) for d in to_process}
+
+    def _apply_budget(self, lines: Iterable[str]) -> Iterator[str]:
+        """Stop after ``max_tree_lines`` lines or ``max_tree_bytes`` bytes, noting the cut."""
+        max_lines, max_bytes = self.max_tree_lines, self.max_tree_bytes
+        if not max_lines and not max_bytes:
+            yield from lines
+            return
+        count = size = 0
+        for line in lines:
+            size += len(line.encode("utf-8")) + 1
+            if (max_lines and count >= max_lines) or (max_bytes and size > max_bytes):
+                if self.metrics is not None:
+                    self.metrics.count("trees_truncated")
+                yield f"… tree truncated after {count:,} lines to fit the output budget"
                 return
+            count += 1
+            yield line
+
+    def _config_prefixes(self, config_paths: Optional[Collection[str]]) -> FrozenSet[str]:
+        """Compiled form of ``config_paths`` for ``_iter_dir``, built once per distinct set."""
+        if not config_paths:
+            return frozenset()
+        key = frozenset(config_paths)
+        index = self._prefix_index.get(key)
+        if index is None:
+            index = self._prefix_index[key] = config_path_prefixes(key)
+        return index
 
-            items = sorted(list(dir_path.iterdir()), key=lambda x: (not x.is_file(), x.name))
-            for i, item in enumerate(items):
-                rel_path = str(item.relative_to(self.project_root))
-                if item.is_dir():
-                    if item.name in self.exclude_dirs or self.matches(str(item)):
+    def _parent_rules(self, root_rel: str) -> DirRules:
+        """Ignore rules inherited by a scan root from the directories above it."""
+        if not root_rel:
+            return self.matches.root_rules
+        return self.matches.rules_for(root_rel.replace(os.sep, "/").rpartition("/")[0])
+
+    def _iter_dir(self, dir_path: str, dir_rel: str, prefix: str, depth: int, max_depth: int,
+                  skip_prefixes: FrozenSet[str], parent_rules: DirRules, descend: Optional[Callable] = None):
+        """Lines of the tree below ``dir_path``; with ``descend``, what it returns for
+        ``(child_path, rel_path, child_prefix, depth, rules)`` takes the place of each subdirectory's lines."""
+        listing = self._list_dir(dir_path, dir_rel, parent_rules)
+        if listing is None:
+            yield f"{prefix}└── … not scanned, the scan budget is spent"
+            return
+        total, kept, rules, omitted = listing
+        last = total - 1
+        shown = 0
+        for pos, (i, name, is_dir) in enumerate(kept):
+            if self.max_entries_per_dir and shown >= self.max_entries_per_dir:
+                if self.metrics is not None:
+                    self.metrics.count("entries_capped", len(kept) - pos)
+                yield f"{prefix}└── {_more_entries(kept[pos:], omitted)}"
+                return
+            connector = '└── ' if i == last else '├── '
+            if is_dir:
+                rel_path = f"{dir_rel}{os.sep}{name}" if dir_rel else name
+                # Another focus directory lives below this one
+                if rel_path in skip_prefixes:
+                    continue
+                shown += 1
+                yield f"{prefix}{connector}{name}/"
+                # Check depth before descending so the child is never entered
+                if depth < max_depth:
+                    child_path = os.path.join(dir_path, name)
+                    if is_dir == LINKED_DIR and not self._may_follow(child_path):
                         continue
-                    if config_paths and any(cp.startswith(rel_path) for cp in config_paths if cp != rel_path):
+                    child_prefix = prefix + ("    " if i == last else "│   ")
+                    if descend is not None:
+                        yield descend(child_path, rel_path, child_prefix, depth + 1, rules)
+                    else:
+                        yield from self._iter_dir(child_path, rel_path, child_prefix,
+                                                  depth + 1, max_depth, skip_prefixes, rules)
+            else:
+                shown += 1
+                yield f"{prefix}{connector}{name}"
+        if omitted:
+            yield f"{prefix}└── {_more_entries((), omitted)}"
+
+    def _may_follow(self, link_path: str) -> bool:
+        """Whether the walk may descend into the directory symlink ``link_path``.
+
+        Links are followed according to ``follow_symlinks``, and never into
+        a directory that is also one of their ancestors, compared by
+        ``(st_dev, st_ino)``, since that would loop until ``max_depth``.
+        """
+        if self.follow_symlinks == "never":
+            return False
+        try:
+            target = os.stat(link_path)
+            if self.follow_symlinks == "inside":
+                if self._real_root is None:
+                    self._real_root = os.path.realpath(self.project_root)
+                real = os.path.realpath(link_path)
+                if real != self._real_root and not real.startswith(self._real_root + os.sep):
+                    if self.metrics is not None:
+                        self.metrics.count("symlinks_outside")
+                    return False
+            target_id = (target.st_dev, target.st_ino)
+            parent = os.path.dirname(link_path)
+            while True:
+                if self._dir_id(parent) == target_id:
+                    if self.metrics is not None:
+                        self.metrics.count("symlink_cycles")
+                    return False
+                grandparent = os.path.dirname(parent)
+                if grandparent == parent:
+                    return True
+                parent = grandparent
+        except OSError:
+            return False
+
+    def _dir_id(self, path: str) -> Tuple[int, int]:
+        dir_id = self._dir_ids.get(path)
+        if dir_id is None:
+            st = os.stat(path)
+            dir_id = self._dir_ids[path] = (st.st_dev, st.st_ino)
+        return dir_id
+
+    def _budget_spent(self) -> bool:
+        if self.max_scan_entries and self._scan_entries >= self.max_scan_entries:
+            return True
+        if self.max_scan_seconds:
+            if self._scan_deadline is None:
+                self._scan_deadline = time.monotonic() + self.max_scan_seconds
+            elif time.monotonic() > self._scan_deadline:
+                return True
+        return False
+
+    def snapshot(self) -> TreeSnapshot:
+        """Compact snapshot of every directory this generator has listed."""
+        return TreeSnapshot.from_listings(self.listings)
+
+    def _list_dir(self, dir_path: str, dir_rel: str, parent_rules: DirRules):
+        """Return the entry count of ``dir_path``, its filtered ``(index, name, is_dir)`` entries,
+        the ignore rules that apply below it and the ``(files, dirs)`` counts of matching entries
+        left out of a huge directory (or None), or None once the scan budget is spent.
+
+        A directory is listed once per generator; trees walking it again
+        reuse the listing. With a cache attached an unchanged directory
+        costs a single ``stat`` (plus reading its ``.gitignore``, if it has one).
+        """
+        dir_key = dir_rel.replace(os.sep, "/")
+        listing = self.listings.get(dir_key)
+        if listing is None:
+            # Trees walked concurrently wait for each other instead of listing a directory twice
+            with self._listing_locks_guard:
+                lock = self._listing_locks.setdefault(dir_key, threading.Lock())
+            with lock:
+                listing = self.listings.get(dir_key)
+                if listing is None:
+                    if self._budget_spent():
+                        if self.metrics is not None:
+                            self.metrics.count("dirs_over_budget")
+                        return None
+                    listing = self.listings[dir_key] = self._read_dir(dir_path, dir_key, parent_rules)
+                    self._scan_entries += listing[0]
+                    with self._listing_locks_guard:
+                        del self._listing_locks[dir_key]
+                    return listing
+        if self.metrics is not None:
+            self.metrics.count("listings_reused")
+        return listing
+
+    def _read_dir(self, dir_path: str, dir_key: str, parent_rules: DirRules):
+        metrics = self.metrics
+        if self.index is not None:
+            return self._list_index_dir(dir_path, dir_key, parent_rules)
+        if self.cache is not None:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+            cached = self.cache.lookup(dir_path, mtime_ns)
+            if cached is not None:
+                total, kept, has_gitignore, fingerprint = cached
+                rules = self.matches.child_rules(parent_rules, dir_key, has_gitignore)
+                if rules.fingerprint == fingerprint:
+                    if metrics is not None:
+                        metrics.count("dirs_visited")
+                        metrics.count("cache_hits")
+                    return total, kept, rules, None
+
+        # Entries are filtered as they stream in and only the matching ones are sorted.
+        # A huge directory keeps just the first ``max_entries_per_dir`` of them in
+        # display order, found with a bounded partial sort, and counts the rest.
+        t0 = time.perf_counter() if metrics is not None else 0.0
+        bound = self.max_entries_per_dir or 0
+        total = 0
+        matcher_calls = 0
+        has_gitignore = False
+        last_key = None
+        rules = None
+        key_prefix = f"{dir_key}/" if dir_key else ""
+        candidates = []
+        omitted = None
+        limit = HUGE_DIR_ENTRIES
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                total += 1
+                name = entry.name
+                not_file = not entry.is_file()
+                if last_key is None or (not_file, name) > last_key:
+                    last_key = (not_file, name)
+                if name == ".gitignore":
+                    has_gitignore = True
+                if entry.is_dir():
+                    matcher_calls += 1
+                    if self.matches.excluded_name(name):
                         continue
-                    is_last = i == len(items) - 1
-                    tree_lines.append(f"{prefix}{'└── ' if is_last else '├── '}{item.name}/")
-                    _generate(item, prefix + ("    " if is_last else "│   "), depth + 1)
-                else:
-                    if any(item.name.endswith(ext) for ext in self.include_extensions):
-                        is_last = i == len(items) - 1
-                        tree_lines.append(f"{prefix}{'└── ' if is_last else '├── '}{item.name}")
+                    if rules is not None:
+                        matcher_calls += 1
+                        if rules.ignored(key_prefix + name, True):
+                            continue
+                    candidates.append((not_file, name, LINKED_DIR if entry.is_symlink() else True))
+                elif self._has_extension(name):
+                    candidates.append((not_file, name, False))
+                if bound and len(candidates) > limit:
+                    if rules is None:
+                        # The ignore rules are needed before the listing ends
+                        has_gitignore = has_gitignore or os.path.lexists(os.path.join(dir_path, ".gitignore"))
+                        rules = self.matches.child_rules(parent_rules, dir_key, has_gitignore)
+                        matcher_calls += sum(1 for c in candidates if c[2])
+                        candidates = [c for c in candidates if not (c[2] and rules.ignored(key_prefix + c[1], True))]
+                    if len(candidates) > bound:
+                        top = heapq.nsmallest(bound, candidates)
+                        omitted = _omit(omitted, top, candidates)
+                        candidates = top
+                    limit = max(2 * bound, HUGE_DIR_ENTRIES // 4)
+        t1 = time.perf_counter() if metrics is not None else 0.0
+
+        if rules is None:
+            rules = self.matches.child_rules(parent_rules, dir_key, has_gitignore)
+            dirs = [c for c in candidates if c[2]]
+            matcher_calls += len(dirs)
+            if dirs:
+                candidates = [c for c in candidates if not (c[2] and rules.ignored(key_prefix + c[1], True))]
+        t2 = time.perf_counter() if metrics is not None else 0.0
+        candidates.sort()
+        if omitted is not None and len(candidates) > bound:
+            omitted = _omit(omitted, candidates[:bound], candidates)
+            del candidates[bound:]
+        # Only the connector of the directory's last entry depends on the position
+        kept = [(total - 1 if (not_file, name) == last_key else i, name, is_dir)
+                for i, (not_file, name, is_dir) in enumerate(candidates)]
 
-        _generate(directory)
-        return tree_lines
+        if metrics is not None:
+            metrics.add_time("tree.list", t1 - t0)
+            metrics.add_time("tree.filter", t2 - t1)
+            metrics.add_time("tree.sort", time.perf_counter() - t2)
+            metrics.count("dirs_visited")
+            metrics.count("entries_seen", total)
+            metrics.count("entries_pruned", total - len(kept))
+            metrics.count("matcher_calls", matcher_calls)
+            if omitted is not None:
+                metrics.count("dirs_truncated")
+        # A truncated listing cannot be rendered again without its omitted counts
+        if self.cache is not None and omitted is None:
+            self.cache.store(dir_path, mtime_ns, total, kept, has_gitignore, rules.fingerprint)
+        return total, kept, rules, omitted
+
+    def _list_index_dir(self, dir_path: str, dir_key: str, parent_rules: DirRules):
+        """``_list_dir`` over the tracked entries of the git index.
+
+        Tracked entries are never matched against ignore rules, as in git.
+        With ``git_untracked`` the directory is also listed and untracked
+        entries are added, with untracked directories filtered by the
+        ignore rules like the scandir backend does.
+        """
+        listing = self.index.listing(dir_key)
+        rules = parent_rules
+        untracked = ()
+        if self.git_untracked:
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = [(entry.name, LINKED_DIR if entry.is_symlink() and entry.is_dir() else entry.is_dir())
+                               for entry in it]
+            except OSError:
+                entries = []
+            tracked = dict(listing)
+            has_gitignore = ".gitignore" in tracked or any(name == ".gitignore" for name, _ in entries)
+            rules = self.matches.child_rules(parent_rules, dir_key, has_gitignore)
+            untracked = {name for name, _ in entries if name not in tracked}
+            if untracked:
+                listing = sorted(listing + [entry for entry in entries if entry[0] in untracked],
+                                 key=lambda item: (item[1], item[0]))
+
+        key_prefix = f"{dir_key}/" if dir_key else ""
+        kept = []
+        for i, (name, is_dir) in enumerate(listing):
+            if is_dir:
+                if self.matches.excluded_name(name):
+                    continue
+                if name in untracked and rules.ignored(key_prefix + name, True):
+                    continue
+                kept.append((i, name, True))
+            elif self._has_extension(name):
+                kept.append((i, name, False))
+
+        if self.metrics is not None:
+            self.metrics.count("dirs_visited")
+            self.metrics.count("entries_seen", len(listing))
+            self.metrics.count("entries_pruned", len(listing) - len(kept))
+        return len(listing), kept, rules, None
 
     def find_focus_dirs(self, directory: Path, focus_dirs: list):
         found_dirs = []
@@ -53,3 +432,245 @@ class ProjectTreeGenerator:
             if path_candidate.exists() and path_candidate.is_dir():
                 found_dirs.append(path_candidate)
         return found_dirs
+
+class FocusTree:
+    """The unwalked tree of one focus directory, as returned by ``generate_focus_trees``.
+
+    Iterating walks it on the calling thread, like ``iter_tree``; ``stream``
+    walks it on a thread pool instead.
+    """
+
+    __slots__ = ("generator", "directory", "max_depth", "config_paths")
+
+    def __init__(self, generator: ProjectTreeGenerator, directory: Path, max_depth: int,
+                 config_paths: Optional[Collection[str]]):
+        self.generator = generator
+        self.directory = directory
+        self.max_depth = max_depth
+        self.config_paths = config_paths
+
+    def __iter__(self) -> Iterator[str]:
+        return self.generator.iter_tree(self.directory, self.max_depth, self.config_paths)
+
+    def stream(self, submit: Callable, workers: int = 1) -> Iterable[str]:
+        """The tree's lines, walked by tasks given to ``submit`` (a thread pool's) once iteration starts.
+
+        With ``workers > 1`` one task lists the focus directory and each of
+        its subdirectories is walked by a task of its own, up to ``workers``
+        of them at a time. Their lines are stitched back in listing order,
+        so the output is identical to a serial walk. The result has a
+        ``close`` method that stops the walk early.
+        """
+        if workers <= 1:
+            return TreeStream(submit, self.__iter__, self.generator.metrics)
+        return _SplitTreeStream(self, submit, workers)
+
+class TreeStream:
+    """Lines produced by a task on a thread pool and handed to the iterating thread in bounded batches.
+
+    The task is submitted on the first iteration, so it only holds a pool
+    thread while something consumes its lines, and it waits whenever
+    ``STREAM_QUEUE_BATCHES`` batches are pending. An exception raised by
+    the walk is raised by the iteration. ``close`` stops the task early.
+    """
+
+    __slots__ = ("_submit", "_walk", "_metrics", "_queue", "_future", "_closed", "_waited")
+
+    def __init__(self, submit: Callable, walk: Callable[[], Iterable[str]], metrics: Optional[Metrics] = None):
+        self._submit = submit
+        self._walk = walk
+        self._metrics = metrics
+        self._queue: queue.Queue = queue.Queue(STREAM_QUEUE_BATCHES)
+        self._future = None
+        self._closed = False
+        self._waited = 0.0
+
+    def start(self):
+        """Submit the task now instead of on the first iteration."""
+        if self._future is None and not self._closed:
+            self._future = self._submit(self._produce)
+
+    def __iter__(self) -> Iterator[str]:
+        self.start()
+        while not self._closed:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            if isinstance(batch, BaseException):
+                raise batch
+            yield from batch
+
+    def close(self):
+        self._closed = True
+        if self._future is not None:
+            self._future.cancel()
+        # Unblock a producer waiting for room; it checks ``_closed`` before every batch
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _produce(self):
+        started = time.perf_counter()
+        batch = []
+        try:
+            for line in self._walk():
+                batch.append(line)
+                if len(batch) >= STREAM_BATCH_LINES:
+                    if not self._put(batch):
+                        return
+                    batch = []
+            if self._put(batch):
+                self._put(None)
+        except Exception as e:
+            self._put(e)
+        finally:
+            if self._metrics is not None:
+                # Time spent waiting for the consumer is not walking
+                self._metrics.add_time("tree", time.perf_counter() - started - self._waited)
+
+    def _put(self, item) -> bool:
+        if self._closed:
+            return False
+        started = time.perf_counter()
+        self._queue.put(item)
+        self._waited += time.perf_counter() - started
+        return True
+
+class _SplitTreeStream:
+    """``FocusTree.stream`` with the focus directory's subdirectories walked as separate tasks."""
+
+    __slots__ = ("tree", "_submit", "_workers", "_subtrees", "_closed")
+
+    def __init__(self, tree: FocusTree, submit: Callable, workers: int):
+        self.tree = tree
+        self._submit = submit
+        self._workers = workers
+        self._subtrees: List[TreeStream] = []
+        self._closed = False
+
+    def __iter__(self) -> Iterator[str]:
+        tree = self.tree
+        if tree.max_depth < 0 or self._closed:
+            return iter(())
+        parts = self._submit(self._list_root).result()
+        self._subtrees = [part for part in parts if isinstance(part, TreeStream)]
+        return tree.generator._apply_budget(self._stitch(parts))
+
+    def close(self):
+        self._closed = True
+        for subtree in self._subtrees:
+            subtree.close()
+
+    def _list_root(self) -> list:
+        """The focus directory's own lines, with an unstarted ``TreeStream`` in place of each subdirectory."""
+        started = time.perf_counter()
+        tree = self.tree
+        generator = tree.generator
+        skip_prefixes = generator._config_prefixes(tree.config_paths)
+
+        def descend(child_path, rel_path, child_prefix, depth, rules):
+            walk = functools.partial(generator._iter_dir, child_path, rel_path, child_prefix, depth,
+                                     tree.max_depth, skip_prefixes, rules)
+            return TreeStream(self._submit, walk, generator.metrics)
+
+        root_rel = str(Path(tree.directory).relative_to(generator.project_root))
+        root_rel = "" if root_rel == "." else root_rel
+        try:
+            return list(generator._iter_dir(os.fspath(tree.directory), root_rel, "", 0, tree.max_depth,
+                                            skip_prefixes, generator._parent_rules(root_rel), descend=descend))
+        finally:
+            if generator.metrics is not None:
+                generator.metrics.add_time("tree", time.perf_counter() - started)
+
+    def _stitch(self, parts: list) -> Iterator[str]:
+        subtrees = self._subtrees
+        index = started = 0
+        for part in parts:
+            if not isinstance(part, TreeStream):
+                yield part
+                continue
+            # Keep the next subdirectories walking while this one is read; they start in
+            # reading order, so a task waiting for its reader never blocks one being read
+            while started < min(index + self._workers, len(subtrees)):
+                subtrees[started].start()
+                started += 1
+            yield from part
+            index += 1
+
+def generate_project_trees(project_dir: Path, config_dir: Path, config: CompiledConfig,
+                           cache: Optional[TreeCache] = None, metrics: Optional[Metrics] = None,
+                           only: Optional[Sequence[Path]] = None,
+                           recorder: Optional[TreeRecorder] = None,
+                           rules_cache: Optional[RulesCache] = None) -> Tuple[List[Path], Dict[str, FocusTree]]:
+    """Focus directories and trees of the project and of its workspace packages.
+
+    The root is rendered with ``config``. With ``detect_depth`` set, every
+    subproject found below the root is rendered with its own merged profile
+    and focus directories (or the subproject itself when none of them
+    exist). Every group skips directories that hold another group's focus
+    directory. ``only`` restricts the output to those focus directories.
+    Returns the focus directories and their unwalked ``FocusTree``s, like
+    ``generate_focus_trees``. The listings of every
+    group are added to ``recorder``, complete once the trees are walked.
+    Every group's ignore matcher shares ``rules_cache``.
+    """
+    generator = ProjectTreeGenerator(project_dir, config_dir, config, cache=cache, metrics=metrics,
+                                     rules_cache=rules_cache)
+    groups = [(generator, config, generator.find_focus_dirs(project_dir, config.get("tree_focus", [])))]
+
+    started = time.perf_counter()
+    for rel_path, sub_config in subproject_configs(project_dir, config):
+        # The tree cache is bound to one set of filters, so subprojects walk without it
+        sub_generator = ProjectTreeGenerator(project_dir, config_dir, sub_config, metrics=metrics,
+                                             rules_cache=rules_cache)
+        sub_focus = sub_generator.find_focus_dirs(project_dir, sub_config["tree_focus"]) or [project_dir / rel_path]
+        groups.append((sub_generator, sub_config, sub_focus))
+    if metrics is not None and len(groups) > 1:
+        metrics.add_time("detect", time.perf_counter() - started)
+        metrics.count("subprojects", len(groups) - 1)
+
+    config_paths = set(config.config_paths)
+    for _, sub_config, sub_focus in groups[1:]:
+        config_paths.update(str(d.relative_to(project_dir)) for d in sub_focus)
+    if only is not None:
+        wanted = set(only)
+        groups = [(g, c, [d for d in dirs if d in wanted]) for g, c, dirs in groups]
+
+    focus_dirs: List[Path] = []
+    trees: Dict[str, FocusTree] = {}
+    for group_generator, group_config, dirs in groups:
+        if recorder is not None:
+            recorder.add(group_generator.listings)
+        dirs = [d for d in dirs if str(d.relative_to(project_dir)) not in trees]
+        if not dirs:
+            continue
+        group_trees = group_generator.generate_focus_trees(
+            dirs,
+            max_depth=group_config.get("max_depth", 3),
+            config_paths=config_paths
+        )
+        trees.update(group_trees)
+        # In scan order: nested focus directories after the ones containing them
+        focus_dirs.extend(project_dir / rel for rel in group_trees)
+    return focus_dirs, trees
+
+def _more_entries(remaining: Iterable[tuple], omitted: Optional[Tuple[int, int]] = None) -> str:
+    files, dirs = omitted or (0, 0)
+    for _, _, is_dir in remaining:
+        if is_dir:
+            dirs += 1
+        else:
+            files += 1
+    if not dirs:
+        return f"… and {files:,} more files"
+    if not files:
+        return f"… and {dirs:,} more directories"
+    return f"… and {files:,} more files and {dirs:,} more directories"
+
+def _omit(omitted: Optional[Tuple[int, int]], kept: List[tuple], candidates: List[tuple]) -> Tuple[int, int]:
+    """``omitted`` plus the ``(files, dirs)`` among ``candidates`` that are not ``kept``."""
+    files, dirs = omitted or (0, 0)
+    dropped_dirs = sum(1 for c in candidates if c[2]) - sum(1 for c in kept if c[2])
+    return files + len(candidates) - len(kept) - dropped_dirs, dirs + dropped_dirs
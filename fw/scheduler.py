@@ -0,0 +1,253 @@
+"""Recurring regeneration of many projects in one process, for ``fw schedule`` and ``fw daemon --schedule``.
+
+Every project comes due once per ``interval``, shifted by random jitter
+so projects registered together do not scan in lockstep. At most
+``max_concurrent`` scans run at once; when more projects are due than
+there are free slots, the highest ``priority`` goes first. A project whose
+previous scan (scheduled, or requested from a client of the daemon) is
+still running skips that cycle instead of queueing another one behind it.
+Each run that finds no change (no listing changed and no agent was
+rewritten) doubles the project's interval, up to ``max_backoff`` times,
+and the first change resets it.
+
+Scans go through ``Daemon.handle``, so scheduled and client-requested
+runs of a project share its tree cache, baseline snapshot and lock.
+"""
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
+
+from fw.daemon import Daemon
+from fw.metrics import Metrics
+
+# Minutes, like the interval of the interactive recurring mode
+DEFAULT_INTERVAL = 1.0
+DEFAULT_JITTER = 0.1
+DEFAULT_MAX_BACKOFF = 8
+DEFAULT_MAX_CONCURRENT = 2
+
+_SCHEDULE_LINE = re.compile(r"^(?P<path>.*?)(?P<options>(?:\s+\w+=\S+)*)\s*$")
+
+def read_schedule(stream: TextIO) -> List[Tuple[str, dict]]:
+    """Read ``path [interval=<minutes>] [priority=<n>]`` lines, skipping blank lines and ``#`` comments.
+
+    Returns ``(path, options)`` pairs; options a line leaves out fall back
+    to the scheduler's defaults. Raises ``ValueError`` on unknown options.
+    """
+    entries = []
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        m = _SCHEDULE_LINE.match(line)
+        options = {}
+        for item in m.group("options").split():
+            key, _, value = item.partition("=")
+            try:
+                if key == "interval":
+                    options["interval"] = float(value)
+                elif key == "priority":
+                    options["priority"] = int(value)
+                else:
+                    raise ValueError(f"unknown option {key!r}")
+            except ValueError as e:
+                raise ValueError(f"Schedule line {number}: {e}") from None
+        entries.append((m.group("path"), options))
+    return entries
+
+class ScheduledProject:
+    """One registered project and its schedule."""
+
+    __slots__ = ("project", "interval", "priority", "backoff", "due", "running", "runs", "skipped",
+                 "failures", "last")
+
+    def __init__(self, project: str, interval: float, priority: int):
+        self.project = project
+        # Minutes
+        self.interval = interval
+        self.priority = priority
+        self.backoff = 1
+        self.due = 0.0
+        self.running = False
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last: Optional[dict] = None
+
+    @property
+    def period(self) -> float:
+        """Seconds between runs, after backoff."""
+        return self.interval * 60 * self.backoff
+
+    def as_dict(self) -> dict:
+        return {
+            "project": self.project,
+            "interval": self.interval,
+            "priority": self.priority,
+            "backoff": self.backoff,
+            "next_in": None if self.running else round(max(self.due - time.monotonic(), 0.0), 1),
+            "running": self.running,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "last": self.last,
+        }
+
+class Scheduler:
+    """Runs registered projects through ``daemon`` on their schedules until ``stop`` is called.
+
+    ``on_result`` is called with each run's response (from the scan's
+    thread) and is where callers print or log them.
+    """
+
+    def __init__(self, daemon: Daemon, max_concurrent: int = DEFAULT_MAX_CONCURRENT, jitter: float = DEFAULT_JITTER,
+                 max_backoff: int = DEFAULT_MAX_BACKOFF, on_result: Optional[Callable[[dict], None]] = None):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.daemon = daemon
+        self.max_concurrent = max_concurrent
+        self.jitter = jitter
+        self.max_backoff = max(1, max_backoff)
+        self.on_result = on_result
+        self.projects: Dict[str, ScheduledProject] = {}
+        self.metrics = Metrics()
+        self.active = 0
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        # (due, seq, project) of projects waiting for their time, and
+        # (-priority, due, seq, project) of those waiting for a free slot
+        self._waiting: List[tuple] = []
+        self._ready: List[tuple] = []
+
+    def add(self, path: str, interval: float = DEFAULT_INTERVAL, priority: int = 0) -> ScheduledProject:
+        """Register a project to regenerate every ``interval`` minutes, or update its schedule.
+
+        The first run comes within one jitter span, so a schedule of many
+        projects starts spread out rather than all at once.
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        key = str(self.daemon.project(path).project_dir)
+        with self._cond:
+            entry = self.projects.get(key)
+            if entry is None:
+                entry = self.projects[key] = ScheduledProject(key, interval, priority)
+                self._push(time.monotonic() + random.uniform(0, self.jitter) * entry.period, entry)
+            else:
+                entry.interval, entry.priority = interval, priority
+            self._cond.notify()
+        return entry
+
+    def remove(self, path: str):
+        """Stop scheduling a project; a scan already running finishes."""
+        with self._cond:
+            self.projects.pop(str(Path(path).resolve()), None)
+
+    def run(self):
+        """Dispatch due projects until ``stop``; scans run on threads of their own, at most ``max_concurrent``."""
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                while self._waiting and self._waiting[0][0] <= now:
+                    due, seq, entry = heapq.heappop(self._waiting)
+                    if self._current(entry, due):
+                        heapq.heappush(self._ready, (-entry.priority, due, seq, entry))
+
+                if self._ready and self.active < self.max_concurrent:
+                    _, due, _, entry = heapq.heappop(self._ready)
+                    if not self._current(entry, due):
+                        continue
+                    state = self.daemon.projects.get(entry.project)
+                    if state is not None and state.lock.locked():
+                        # A client request is regenerating it right now
+                        self._skip(entry, now)
+                        continue
+                    entry.running = True
+                    self.active += 1
+                    threading.Thread(target=self._run_one, args=(entry, now), daemon=True,
+                                     name=f"fw-schedule-{entry.project}").start()
+                    continue
+
+                timeout = None
+                if self._waiting and not (self._ready and self.active >= self.max_concurrent):
+                    timeout = self._waiting[0][0] - now
+                self._cond.wait(timeout)
+
+    def start(self) -> threading.Thread:
+        """Run the dispatcher on a daemon thread."""
+        thread = threading.Thread(target=self.run, daemon=True, name="fw-scheduler")
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop dispatching; scans already running finish on their own."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def as_dict(self) -> dict:
+        with self._cond:
+            projects = list(self.projects.values())
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "projects": [entry.as_dict() for entry in projects],
+            **self.metrics.as_dict(),
+        }
+
+    def _run_one(self, entry: ScheduledProject, started: float):
+        self.metrics.count("scheduled_runs")
+        # Failures come back as responses, so the slot is always released
+        response = self.daemon.handle({"cmd": "regenerate", "project": entry.project})
+        with self._cond:
+            self._finish(entry, started, response)
+            self._cond.notify()
+        if self.on_result is not None:
+            self.on_result(response)
+
+    def _finish(self, entry: ScheduledProject, started: float, response: dict):
+        entry.running = False
+        self.active -= 1
+        entry.runs += 1
+        if not response.get("ok"):
+            entry.failures += 1
+            self.metrics.count("scheduled_failures")
+        # The first run has no baseline to compare with, so it counts as a change, and so do
+        # rewritten agents: edited files change their summaries without changing any listing
+        changes = response.get("changes")
+        if response.get("ok") and (changes is None or changes["changed_dirs"]
+                                   or response.get("files", {}).get("written")):
+            entry.backoff = 1
+        else:
+            entry.backoff = min(entry.backoff * 2, self.max_backoff)
+        entry.last = {key: response.get(key) for key in ("ok", "error", "seconds", "files") if key in response}
+        if entry.project not in self.projects:
+            return
+
+        # Cycles that came due while the scan ran are skipped, not made up
+        now = time.monotonic()
+        due = started + entry.period
+        while due <= now:
+            entry.skipped += 1
+            self.metrics.count("scheduled_skips")
+            due += entry.period
+        self._push(due + random.uniform(-self.jitter, self.jitter) * entry.period, entry)
+
+    def _skip(self, entry: ScheduledProject, now: float):
+        entry.skipped += 1
+        self.metrics.count("scheduled_skips")
+        self._push(now + entry.period * (1 + random.uniform(-self.jitter, self.jitter)), entry)
+
+    def _push(self, due: float, entry: ScheduledProject):
+        entry.due = due
+        heapq.heappush(self._waiting, (due, next(self._seq), entry))
+
+    def _current(self, entry: ScheduledProject, due: float) -> bool:
+        """Whether a queued ``due`` is still the project's next run; removal and rescheduling leave stale ones."""
+        return self.projects.get(entry.project) is entry and entry.due == due
@@ -0,0 +1,240 @@
+"""Top-level symbols of source files, extracted in a process pool and cached in SQLite.
+
+Python files are parsed with ``ast``; JavaScript, TypeScript, Go and Rust
+files are scanned with line-anchored regular expressions for their exports
+and function and type names. Each summary is cached under the file's path,
+size and ``mtime_ns``, so a regeneration only parses the files that changed.
+"""
+import ast
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fw.metrics import Metrics
+from fw.tree_cache import RACY_WINDOW_NS, default_cache_dir
+from fw.tree_model import TreeRecorder
+
+SUMMARY_CACHE_VERSION = 1
+SUMMARY_CACHE_FILE = "summaries.sqlite"
+
+# Larger files are listed without symbols; they are rarely hand-written code
+MAX_SUMMARY_BYTES = 512 * 1024
+MAX_SYMBOLS_PER_FILE = 12
+MAX_SUMMARY_FILES = 200
+# Fewer changed files than this are parsed in-process, which beats starting a pool
+PARALLEL_THRESHOLD = 64
+
+_JS_EXPORT = re.compile(
+    r"^export\s+(?:default\s+)?(?:declare\s+)?(?:abstract\s+)?(?:async\s+)?"
+    r"(?:function\s*\*?|class|const|let|var|interface|type|enum)\s+([A-Za-z_$][\w$]*)", re.M)
+_JS_EXPORT_LIST = re.compile(r"^export\s*(?:type\s*)?\{([^}]*)\}", re.M)
+_JS_FUNCTION = re.compile(r"^(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)", re.M)
+_GO_SYMBOL = re.compile(r"^(?:func\s+(?:\([^)]*\)\s*)?|type\s+)([A-Za-z_]\w*)", re.M)
+_RUST_SYMBOL = re.compile(
+    r"^(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?(?:unsafe\s+)?(?:const\s+)?(?:extern\s+\"[^\"]*\"\s+)?"
+    r"(?:fn|struct|enum|trait|type|mod|union)\s+([A-Za-z_]\w*)", re.M)
+
+def _python_symbols(source: bytes) -> List[str]:
+    symbols = []
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols.append(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            # Module constants only; other assignments are implementation detail
+            symbols.extend(t.id for t in targets if isinstance(t, ast.Name) and t.id.isupper())
+    return [name for name in symbols if not name.startswith("_")]
+
+def _js_symbols(source: bytes) -> List[str]:
+    text = source.decode("utf-8", "replace")
+    symbols = [m.group(1) for m in _JS_EXPORT.finditer(text)]
+    for m in _JS_EXPORT_LIST.finditer(text):
+        for item in m.group(1).split(","):
+            # ``export { a as b }`` exports ``b``
+            name = item.split(" as ")[-1].strip()
+            if name:
+                symbols.append(name)
+    symbols.extend(m.group(1) for m in _JS_FUNCTION.finditer(text))
+    return symbols
+
+def _regex_symbols(pattern: "re.Pattern") -> Callable[[bytes], List[str]]:
+    return lambda source: [m.group(1) for m in pattern.finditer(source.decode("utf-8", "replace"))]
+
+SUMMARIZERS: Dict[str, Callable[[bytes], List[str]]] = {
+    ".py": _python_symbols,
+    ".pyi": _python_symbols,
+    ".go": _regex_symbols(_GO_SYMBOL),
+    ".rs": _regex_symbols(_RUST_SYMBOL),
+}
+for _suffix in (".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".mts", ".cts"):
+    SUMMARIZERS[_suffix] = _js_symbols
+
+def can_summarize(name: str) -> bool:
+    return os.path.splitext(name)[1] in SUMMARIZERS
+
+def summarize_source(path: str) -> List[str]:
+    """Top-level symbols of the file at ``path``, in source order, at most ``MAX_SYMBOLS_PER_FILE``.
+
+    Unreadable, oversized and unparsable files have no symbols.
+    """
+    summarize = SUMMARIZERS.get(os.path.splitext(path)[1])
+    if summarize is None:
+        return []
+    try:
+        if os.path.getsize(path) > MAX_SUMMARY_BYTES:
+            return []
+        with open(path, 'rb') as f:
+            source = f.read()
+        symbols = summarize(source)
+    except (OSError, SyntaxError, ValueError, RecursionError):
+        return []
+    return list(dict.fromkeys(symbols))[:MAX_SYMBOLS_PER_FILE]
+
+class SummaryCache:
+    """Summaries keyed on path and validated against the file's size and ``mtime_ns``."""
+
+    def __init__(self, cache_file: Path):
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Scan threads share the connection, one statement at a time
+        self._db = sqlite3.connect(os.fspath(cache_file), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != SUMMARY_CACHE_VERSION:
+                self._db.execute("DROP TABLE IF EXISTS summaries")
+                self._db.execute(f"PRAGMA user_version = {SUMMARY_CACHE_VERSION}")
+            self._db.execute("CREATE TABLE IF NOT EXISTS summaries "
+                             "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, symbols TEXT)")
+
+    def lookup(self, paths: Sequence[str]) -> Dict[str, Tuple[int, int, List[str]]]:
+        found = {}
+        with self._lock:
+            # Stay below SQLite's limit on bound parameters
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT path, size, mtime_ns, symbols FROM summaries WHERE path IN ({','.join('?' * len(chunk))})",
+                    chunk)
+                for path, size, mtime_ns, symbols in rows:
+                    found[path] = (size, mtime_ns, json.loads(symbols))
+        return found
+
+    def store(self, rows: Sequence[Tuple[str, int, int, List[str]]]):
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)",
+                                 [(path, size, mtime_ns, json.dumps(symbols)) for path, size, mtime_ns, symbols in rows])
+
+    def close(self):
+        self._db.close()
+
+class Summarizer:
+    """Summaries of the files in each focus directory's tree, for ``run_agent_pipeline``.
+
+    Called with a focus directory relative to the project, it returns
+    ``(path, symbols)`` for the summarizable files the scan listed below
+    it, paths relative to the focus directory. Files are looked up in the
+    cache by ``stat``; changed ones are parsed, on a process pool of
+    ``workers`` processes once there are ``PARALLEL_THRESHOLD`` of them.
+    """
+
+    def __init__(self, project_dir: Path, recorder: TreeRecorder, cache: Optional[SummaryCache] = None,
+                 workers: Optional[int] = None, metrics: Optional[Metrics] = None):
+        self.project_dir = project_dir
+        self.recorder = recorder
+        self.cache = cache
+        self.workers = workers or os.cpu_count() or 1
+        self.metrics = metrics
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def __call__(self, rel_dir: str) -> List[Tuple[str, List[str]]]:
+        started = time.perf_counter()
+        dir_key = "" if rel_dir == "." else rel_dir.replace(os.sep, "/")
+        files = [f for f in self.recorder.files_below(dir_key) if can_summarize(f)][:MAX_SUMMARY_FILES]
+        keys = [f"{dir_key}/{f}" if dir_key else f for f in files]
+        summaries = self.summarize(keys)
+        if self.metrics is not None:
+            self.metrics.add_time("summarize", time.perf_counter() - started)
+        return [(f, summaries[key]) for f, key in zip(files, keys) if summaries.get(key)]
+
+    def summarize(self, keys: Sequence[str]) -> Dict[str, List[str]]:
+        """Symbols of the files at ``keys``, ``/``-separated paths relative to the project."""
+        cached = self.cache.lookup(keys) if self.cache is not None else {}
+        result: Dict[str, List[str]] = {}
+        changed = []
+        for key in keys:
+            try:
+                st = os.stat(self.project_dir / key)
+            except OSError:
+                continue
+            record = cached.get(key)
+            if record is not None and record[0] == st.st_size and record[1] == st.st_mtime_ns:
+                result[key] = record[2]
+            else:
+                changed.append((key, st))
+
+        parsed = self._parse([os.fspath(self.project_dir / key) for key, _ in changed])
+        racy = time.time_ns() - RACY_WINDOW_NS
+        rows = []
+        for (key, st), symbols in zip(changed, parsed):
+            result[key] = symbols
+            # A change within the same mtime tick would go unnoticed, so such files are parsed again next time
+            if st.st_mtime_ns < racy:
+                rows.append((key, st.st_size, st.st_mtime_ns, symbols))
+        if self.cache is not None:
+            self.cache.store(rows)
+        if self.metrics is not None:
+            self.metrics.count("summary_files", len(keys))
+            self.metrics.count("summary_cache_hits", len(keys) - len(changed))
+            self.metrics.count("summary_parsed", len(changed))
+        return result
+
+    def _parse(self, paths: List[str]) -> List[List[str]]:
+        if len(paths) < PARALLEL_THRESHOLD or self.workers <= 1:
+            return [summarize_source(path) for path in paths]
+        chunksize = max(1, len(paths) // (self.workers * 4))
+        return list(self._process_pool().map(summarize_source, paths, chunksize=chunksize))
+
+    def _process_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # Scan threads are running, so don't fork them
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self.cache is not None:
+            self.cache.close()
+
+@contextmanager
+def open_summarizer(project_dir: Path, config, recorder: TreeRecorder,
+                    metrics: Optional[Metrics] = None) -> Iterator[Optional[Summarizer]]:
+    """A ``Summarizer`` for the project if the config enables ``summaries``, else None.
+
+    The cache lives in the project's cache directory; if it cannot be
+    opened, files are summarized without one.
+    """
+    if not config.get("summaries", False):
+        yield None
+        return
+    try:
+        cache = SummaryCache(default_cache_dir(project_dir) / SUMMARY_CACHE_FILE)
+    except (OSError, sqlite3.Error):
+        cache = None
+    summarizer = Summarizer(project_dir, recorder, cache, config.get("summary_workers"), metrics)
+    try:
+        yield summarizer
+    finally:
+        summarizer.close()
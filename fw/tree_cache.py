@@ -0,0 +1,111 @@
+"""Persistent cache of filtered directory listings keyed on directory mtimes."""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+CACHE_VERSION = 3
+
+# Directories modified this close to the scan are re-listed next time, since a
+# change landing in the same mtime tick would otherwise go unnoticed.
+RACY_WINDOW_NS = 2_000_000_000
+
+def default_cache_dir(project_root: Path) -> Path:
+    """Per-project cache directory under the user's cache home."""
+    base = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    digest = hashlib.sha1(str(Path(project_root).resolve()).encode("utf-8")).hexdigest()[:16]
+    return base / "flowwizard" / digest
+
+class TreeCache:
+    """Directory listings from previous scans, reused while a directory's mtime is unchanged.
+
+    Each entry maps a scanned directory path to its ``mtime_ns``, the total
+    number of entries it contained, the entries that survived filtering as
+    ``(index, name, is_dir)`` tuples in display order, whether it has a
+    ``.gitignore`` and the fingerprint of the ignore rules used to filter it.
+
+    ``save`` writes the file at most once per ``save_interval`` seconds;
+    listings changed in between are written by a later ``save`` or by
+    ``flush``.
+    """
+
+    def __init__(self, cache_file: Path, save_interval: float = 0.0):
+        self.cache_file = Path(cache_file)
+        self.save_interval = save_interval
+        self.signature = ""
+        self._dirs: Dict[str, list] = {}
+        self._seen: Dict[str, list] = {}
+        self._dirty = False
+        self._pending = False
+        self._saved_at = float("-inf")
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == CACHE_VERSION:
+            self.signature = data.get("signature", "")
+            self._dirs = data.get("dirs", {})
+
+    def reset(self, signature: str):
+        """Drop every listing if the filter signature changed."""
+        if signature != self.signature:
+            self.signature = signature
+            self._dirs = {}
+            self._seen = {}
+            self._dirty = True
+
+    def lookup(self, dir_path: str, mtime_ns: int) -> Optional[Tuple[int, List[tuple], bool, str]]:
+        record = self._dirs.get(dir_path)
+        if record is None or record[0] != mtime_ns:
+            return None
+        self._seen[dir_path] = record
+        return record[1], record[2], record[3], record[4]
+
+    def store(self, dir_path: str, mtime_ns: int, total: int, kept: List[tuple],
+              has_gitignore: bool, fingerprint: str):
+        if mtime_ns >= time.time_ns() - RACY_WINDOW_NS:
+            self._dirs.pop(dir_path, None)
+            return
+        record = [mtime_ns, total, kept, has_gitignore, fingerprint]
+        self._dirs[dir_path] = record
+        self._seen[dir_path] = record
+        self._dirty = True
+
+    def save(self, prune: bool = True):
+        """Keep the listings seen since the last save, dropping directories no longer visited.
+
+        They are written out if anything changed and ``save_interval`` has
+        passed since the last write. With ``prune=False`` (after a scan of only part of the project) the
+        listings that were not visited are kept as well.
+        """
+        if not prune:
+            self._seen = dict(self._dirs, **self._seen)
+        if self._dirty or len(self._seen) != len(self._dirs):
+            self._pending = True
+        self._dirs = self._seen
+        self._seen = {}
+        self._dirty = False
+        if time.monotonic() - self._saved_at >= self.save_interval:
+            self.flush()
+
+    def flush(self):
+        """Write listings that ``save`` kept back, if any."""
+        if not self._pending:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix(".tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({"version": CACHE_VERSION, "signature": self.signature, "dirs": self._dirs}, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            # The cache is only an optimization; an unwritable cache dir just means a full walk next time
+            pass
+        self._pending = False
+        self._saved_at = time.monotonic()
@@ -0,0 +1,261 @@
+"""Compact snapshots of scanned directory trees and the differences between two scans."""
+import sys
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_DIR = 1
+# ``totals`` value of a directory that was not listed during the scan
+UNLISTED = -1
+
+class TreeSnapshot:
+    """The filtered listings of every directory visited by one scan.
+
+    Nodes are numbered breadth-first from the project root (node 0) and
+    stored column-wise: interned ``names``, a ``parents`` index array, a
+    ``flags`` byte per node, the node's ``positions`` in its directory's
+    unfiltered listing and, for directories, the ``totals`` entry count
+    of that listing (``UNLISTED`` if the scan never listed it). Children
+    of a node are contiguous, ``first_child[n]`` to ``first_child[n] +
+    child_count[n]``, in listing order. Directories above the scanned
+    ones are kept as unlisted nodes so every path has its chain of parents.
+    """
+
+    __slots__ = ("names", "parents", "flags", "positions", "totals", "first_child", "child_count")
+
+    def __init__(self):
+        self.names: List[str] = [""]
+        self.parents = array("i", [-1])
+        self.flags = bytearray([_DIR])
+        self.positions = array("i", [0])
+        self.totals = array("i", [UNLISTED])
+        self.first_child = array("i", [0])
+        self.child_count = array("i", [0])
+
+    @classmethod
+    def from_listings(cls, listings: Dict[str, tuple]) -> "TreeSnapshot":
+        """Build a snapshot from ``{dir_key: (total, kept, ...)}`` listings.
+
+        ``dir_key`` is the ``/``-separated path of the directory relative to
+        the project root and ``kept`` its ``(index, name, is_dir)`` entries,
+        as returned by ``ProjectTreeGenerator._list_dir``. Listings that are
+        not reachable through their parent's listing are dropped.
+        """
+        implicit: Dict[str, List[str]] = {}
+        for key in listings:
+            while key:
+                parent, _, name = key.rpartition("/")
+                names = implicit.setdefault(parent, [])
+                if name in names:
+                    break
+                names.append(name)
+                key = parent
+
+        snapshot = cls()
+        names, parents, flags = snapshot.names, snapshot.parents, snapshot.flags
+        positions, totals = snapshot.positions, snapshot.totals
+        first_child, child_count = snapshot.first_child, snapshot.child_count
+        intern = sys.intern
+        keys = [""]
+        node = 0
+        while node < len(keys):
+            key = keys[node]
+            first_child[node] = len(keys)
+            listing = listings.get(key)
+            if not flags[node] & _DIR:
+                children = ()
+            elif listing is not None:
+                totals[node] = listing[0]
+                children = listing[1]
+            else:
+                children = [(0, name, True) for name in sorted(implicit.get(key, ()))]
+            prefix = f"{key}/" if key else ""
+            for position, name, is_dir in children:
+                keys.append(prefix + name)
+                names.append(intern(name))
+                parents.append(node)
+                flags.append(_DIR if is_dir else 0)
+                positions.append(position)
+                totals.append(UNLISTED)
+                first_child.append(0)
+                child_count.append(0)
+            child_count[node] = len(children)
+            node += 1
+        return snapshot
+
+    def __len__(self):
+        return len(self.names)
+
+    def is_dir(self, node: int) -> bool:
+        return bool(self.flags[node] & _DIR)
+
+    def is_listed(self, node: int) -> bool:
+        return self.totals[node] != UNLISTED
+
+    def children(self, node: int) -> range:
+        start = self.first_child[node]
+        return range(start, start + self.child_count[node])
+
+    def path(self, node: int) -> str:
+        """``/``-separated path of ``node`` relative to the project root."""
+        parts = []
+        while node > 0:
+            parts.append(self.names[node])
+            node = self.parents[node]
+        return "/".join(reversed(parts))
+
+    def find(self, path: str) -> Optional[int]:
+        """Node of a ``/``-separated relative path, or None if the scan did not see it."""
+        node = 0
+        for part in filter(None, path.split("/")):
+            for child in self.children(node):
+                if self.names[child] == part:
+                    node = child
+                    break
+            else:
+                return None
+        return node
+
+    def listing(self, node: int) -> Optional[Tuple[int, List[Tuple[int, str, bool]]]]:
+        """``(total, kept)`` of a listed directory, in ``_list_dir``'s format, or None."""
+        if not self.is_listed(node):
+            return None
+        return self.totals[node], [(self.positions[c], self.names[c], self.is_dir(c)) for c in self.children(node)]
+
+    def walk(self, node: int = 0) -> Iterator[int]:
+        """``node`` and its descendants, depth first in listing order."""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(self.children(node)))
+
+    def to_listings(self) -> Dict[str, Tuple[int, List[Tuple[int, str, bool]]]]:
+        """Listings of every listed directory, the inverse of ``from_listings``."""
+        return {self.path(node): self.listing(node) for node in range(len(self)) if self.is_listed(node)}
+
+    def merge(self, newer: "TreeSnapshot") -> "TreeSnapshot":
+        """This snapshot updated with the directories ``newer`` listed, e.g. after a partial scan."""
+        listings = self.to_listings()
+        listings.update(newer.to_listings())
+        return TreeSnapshot.from_listings(listings)
+
+class TreeRecorder:
+    """Listings gathered by every generator of one scan, snapshotted once the walk is done.
+
+    When generators with different filters listed the same directory, the
+    one added first wins.
+    """
+
+    __slots__ = ("_sources",)
+
+    def __init__(self):
+        self._sources: List[Dict[str, tuple]] = []
+
+    def add(self, listings: Dict[str, tuple]):
+        self._sources.append(listings)
+
+    def files_below(self, dir_key: str) -> List[str]:
+        """Files listed in and below the directory ``dir_key``, relative to it, sorted."""
+        files = []
+        stack = [(dir_key, "")]
+        while stack:
+            key, rel = stack.pop()
+            listing = next((listings[key] for listings in self._sources if key in listings), None)
+            if listing is None:
+                continue
+            for _, name, is_dir in listing[1]:
+                if is_dir:
+                    stack.append((f"{key}/{name}" if key else name, f"{rel}{name}/"))
+                else:
+                    files.append(rel + name)
+        return sorted(files)
+
+    def snapshot(self) -> TreeSnapshot:
+        merged: Dict[str, tuple] = {}
+        for listings in self._sources:
+            for key, listing in listings.items():
+                merged.setdefault(key, listing)
+        return TreeSnapshot.from_listings(merged)
+
+class TreeDiff:
+    """Paths added and removed between two snapshots and the directories whose listing changed.
+
+    A directory's listing also changes when only filtered-out entries come
+    or go, since that moves the last-entry connectors of its tree.
+    """
+
+    __slots__ = ("added", "removed", "changed_dirs")
+
+    def __init__(self, added: List[str], removed: List[str], changed_dirs: List[str]):
+        self.added = added
+        self.removed = removed
+        self.changed_dirs = changed_dirs
+
+    def __bool__(self):
+        return bool(self.changed_dirs)
+
+    def __str__(self):
+        return f"{len(self.added)} added, {len(self.removed)} removed"
+
+    def affects(self, rel_dir: str) -> bool:
+        """Whether the tree of the directory ``rel_dir`` (relative, any separator) changed."""
+        key = rel_dir.replace("\\", "/").strip("/")
+        if key == ".":
+            key = ""
+        prefix = f"{key}/"
+        return any(not key or d == key or d.startswith(prefix) for d in self.changed_dirs)
+
+    def as_dict(self) -> dict:
+        return {"added": self.added, "removed": self.removed, "changed_dirs": self.changed_dirs}
+
+def diff_snapshots(old: TreeSnapshot, new: TreeSnapshot) -> TreeDiff:
+    """Compare two scans structurally, directory by directory.
+
+    Children are matched by name only where both scans listed the directory;
+    directories the newer scan did not list (e.g. outside a partial scan)
+    are not reported as changed. Paths of added and removed directories are
+    followed by all their descendants, directories end with ``/``.
+    """
+    added: List[str] = []
+    removed: List[str] = []
+    changed: List[str] = []
+    stack = [(0, 0, "")]
+    while stack:
+        o, n, key = stack.pop()
+        old_children, new_children = old.children(o), new.children(n)
+        prefix = f"{key}/" if key else ""
+        both_listed = old.is_listed(o) and new.is_listed(n)
+        if both_listed and (old.totals[o] != new.totals[n] or not _same_children(old, old_children, new, new_children)):
+            changed.append(key)
+        old_by_name = {old.names[c]: c for c in old_children}
+        for c in new_children:
+            name = new.names[c]
+            match = old_by_name.pop(name, None)
+            if match is not None and old.is_dir(match) == new.is_dir(c):
+                if new.is_dir(c):
+                    stack.append((match, c, prefix + name))
+            elif both_listed:
+                if match is not None:
+                    removed.extend(_subtree_paths(old, match, prefix))
+                added.extend(_subtree_paths(new, c, prefix))
+        if both_listed:
+            for c in old_by_name.values():
+                removed.extend(_subtree_paths(old, c, prefix))
+    return TreeDiff(sorted(added), sorted(removed), sorted(changed))
+
+def _same_children(old: TreeSnapshot, old_children: range, new: TreeSnapshot, new_children: range) -> bool:
+    return (old.names[old_children.start:old_children.stop] == new.names[new_children.start:new_children.stop]
+            and old.flags[old_children.start:old_children.stop] == new.flags[new_children.start:new_children.stop]
+            and old.positions[old_children.start:old_children.stop]
+            == new.positions[new_children.start:new_children.stop])
+
+def _subtree_paths(snapshot: TreeSnapshot, node: int, prefix: str) -> Iterator[str]:
+    stack = [(node, prefix)]
+    while stack:
+        node, prefix = stack.pop()
+        path = prefix + snapshot.names[node]
+        if snapshot.is_dir(node):
+            yield path + "/"
+            stack.extend((child, path + "/") for child in reversed(snapshot.children(node)))
+        else:
+            yield path
@@ -0,0 +1,238 @@
+"""Filesystem watchers used by watch mode: inotify on Linux with a polling fallback."""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Optional, Set
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# The tree only shows names, so content writes are only watched when agents summarize file contents
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+CONTENT_MASK = IN_MODIFY | IN_CLOSE_WRITE
+EVENT_HEADER = struct.Struct("iIII")
+
+DEBOUNCE_SECONDS = 0.2
+MAX_BATCH_SECONDS = 0.8
+
+def _walk_dirs(root: str, depth: int, max_depth: int, exclude_dirs: Set[str]):
+    """Yield ``(path, depth)`` for ``root`` and every subdirectory the tree could show."""
+    yield root, depth
+    if depth >= max_depth:
+        return
+    try:
+        with os.scandir(root) as it:
+            subdirs = [e.path for e in it if e.name not in exclude_dirs and e.is_dir(follow_symlinks=False)]
+    except OSError:
+        return
+    for path in subdirs:
+        yield from _walk_dirs(path, depth + 1, max_depth, exclude_dirs)
+
+class _Watcher(ABC):
+    """Debounced change detection over ``_poll``, which subclasses implement.
+
+    With ``contents``, writes to files also count as changes of their directory.
+    """
+
+    def __init__(self, roots: Iterable[str], exclude_dirs: Iterable[str] = (), max_depth: int = 3,
+                 contents: bool = False):
+        self.roots = [os.fspath(r) for r in roots]
+        self.exclude_dirs = set(exclude_dirs)
+        self.max_depth = max_depth
+        self.contents = contents
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        """Block until something changes and return the changed directories.
+
+        Bursts of events are coalesced: once the first change arrives, events
+        are collected until the tree has been quiet for ``DEBOUNCE_SECONDS``
+        or ``MAX_BATCH_SECONDS`` have passed. Returns an empty set on timeout.
+        """
+        changed = self._poll(timeout)
+        if not changed:
+            return changed
+        deadline = time.monotonic() + MAX_BATCH_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            more = self._poll(min(DEBOUNCE_SECONDS, remaining))
+            if not more:
+                break
+            changed |= more
+        return changed
+
+    @abstractmethod
+    def _poll(self, timeout: Optional[float]) -> Set[str]:
+        """Directories changed within ``timeout`` seconds (None: wait for a change), or an empty set."""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class InotifyWatcher(_Watcher):
+    """Watch directory entry changes with inotify; costs nothing while the tree is idle."""
+
+    def __init__(self, roots: Iterable[str], exclude_dirs: Iterable[str] = (), max_depth: int = 3,
+                 contents: bool = False):
+        super().__init__(roots, exclude_dirs, max_depth, contents)
+        self._mask = WATCH_MASK | CONTENT_MASK if contents else WATCH_MASK
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches: Dict[int, tuple] = {}
+        try:
+            for root in self.roots:
+                self._add_tree(root, 0)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_tree(self, root: str, depth: int):
+        for path, path_depth in _walk_dirs(root, depth, self.max_depth, self.exclude_dirs):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self._mask)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if path == root and depth == 0:
+                    raise OSError(err, f"inotify_add_watch failed for {path}")
+                if err == 28:  # ENOSPC: out of watches, let the caller fall back to polling
+                    raise OSError(err, "inotify watch limit reached")
+                continue
+            self._watches[wd] = (path, path_depth)
+
+    def _poll(self, timeout: Optional[float]) -> Set[str]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                changed.update(self.roots)
+                continue
+            watch = self._watches.get(wd)
+            if watch is None:
+                continue
+            path, depth = watch
+            if mask & IN_IGNORED:
+                del self._watches[wd]
+                continue
+            changed.add(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and depth < self.max_depth \
+                    and name not in self.exclude_dirs:
+                try:
+                    self._add_tree(os.path.join(path, name), depth + 1)
+                except OSError:
+                    changed.update(self.roots)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+class PollingWatcher(_Watcher):
+    """Portable fallback that stats every watched directory once per poll interval.
+
+    With ``contents`` it lists them instead, comparing the files' mtimes and sizes too.
+    """
+
+    def __init__(self, roots: Iterable[str], exclude_dirs: Iterable[str] = (), max_depth: int = 3,
+                 poll_interval: float = 0.5, contents: bool = False):
+        super().__init__(roots, exclude_dirs, max_depth, contents)
+        self.poll_interval = poll_interval
+        self._mtimes: Dict[str, tuple] = {}
+        for root in self.roots:
+            self._snapshot(root, 0)
+
+    def _snapshot(self, root: str, depth: int):
+        for path, path_depth in _walk_dirs(root, depth, self.max_depth, self.exclude_dirs):
+            try:
+                self._mtimes[path] = (self._state(path), path_depth)
+            except OSError:
+                self._mtimes.pop(path, None)
+
+    def _state(self, path: str):
+        """The directory's mtime, plus its files' mtimes and sizes when watching contents."""
+        mtime_ns = os.stat(path).st_mtime_ns
+        if not self.contents:
+            return mtime_ns
+        files = []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    files.append((entry.name, st.st_mtime_ns, st.st_size))
+        return mtime_ns, frozenset(files)
+
+    def _poll(self, timeout: Optional[float]) -> Set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path, (state, depth) in list(self._mtimes.items()):
+                try:
+                    current = self._state(path)
+                except OSError:
+                    current = None
+                if current != state:
+                    changed.add(path)
+                    stale = [p for p in self._mtimes if p == path or p.startswith(path + os.sep)]
+                    for p in stale:
+                        del self._mtimes[p]
+                    if current is not None:
+                        self._snapshot(path, depth)
+            for root in self.roots:
+                if root not in self._mtimes and os.path.isdir(root):
+                    changed.add(root)
+                    self._snapshot(root, 0)
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return changed
+            sleep_for = self.poll_interval
+            if deadline is not None:
+                sleep_for = min(sleep_for, max(0.0, deadline - time.monotonic()))
+            time.sleep(sleep_for)
+
+def create_watcher(roots: Iterable[str], exclude_dirs: Iterable[str] = (), max_depth: int = 3,
+                   contents: bool = False):
+    """Return an inotify watcher on Linux, falling back to polling elsewhere or on failure."""
+    roots = list(roots)
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots, exclude_dirs, max_depth, contents)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots, exclude_dirs, max_depth, contents=contents)
@@ -0,0 +1,21 @@
+import unittest
+from pathlib import Path
+
+from fw.agent_generator import tree_file_path
+
+class TreeFilePathTest(unittest.TestCase):
+    project = Path("/tmp/project")
+
+    def test_tree_file_names_do_not_collide(self):
+        nested = tree_file_path(self.project, "src/app")
+        flat = tree_file_path(self.project, "src_app")
+        self.assertNotEqual(nested, flat)
+        self.assertEqual(nested.name, "tree_src_app.txt")
+        self.assertEqual(flat.name, "tree_src%5Fapp.txt")
+
+    def test_root_tree_does_not_collide_with_a_focus_dir_named_root(self):
+        self.assertEqual(tree_file_path(self.project, ".").name, "tree.txt")
+        self.assertEqual(tree_file_path(self.project, "root").name, "tree_root.txt")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from fw import git_index
+from fw.project_tree_generator import ProjectTreeGenerator
+
+CONFIG = {"include_extensions": [".py", ".md"], "exclude_dirs": [".git"]}
+
+@unittest.skipUnless(shutil.which("git"), "needs the git CLI")
+class ReadIndexTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        (self.root / "src").mkdir()
+        (self.root / "src" / "app.py").write_text("")
+        (self.root / "README.md").write_text("")
+        self.git("init", "-q")
+        self.git("add", "-A")
+        git_index._index_memo.clear()
+
+    def git(self, *args):
+        subprocess.run(["git", "-C", str(self.root), *args], check=True)
+
+    def test_lists_tracked_files(self):
+        entries = git_index.read_index(self.root / ".git" / "index")
+        self.assertEqual([path for path, _ in entries], ["README.md", "src/app.py"])
+        tree = git_index.load_index_tree(self.root)
+        self.assertEqual(tree.listing(""), [("README.md", False), ("src", True)])
+
+    def test_split_index_falls_back(self):
+        self.git("update-index", "--split-index")
+        with self.assertRaises(git_index.GitIndexError):
+            git_index.read_index(self.root / ".git" / "index")
+        self.assertIsNone(git_index.load_index_tree(self.root))
+
+        # The walk lists the working tree, untracked files included
+        (self.root / "src" / "new.py").write_text("")
+        generator = ProjectTreeGenerator(self.root, self.root, dict(CONFIG, tree_backend="git"))
+        self.assertIsNone(generator.index)
+        self.assertEqual(generator.generate_tree(self.root),
+                         ProjectTreeGenerator(self.root, self.root, CONFIG).generate_tree(self.root))
+        self.assertTrue(any("new.py" in line for line in generator.generate_tree(self.root)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from bench_startup import DEFAULT_BUDGET_MS, DEFERRED_MODULES, import_profile, own_cost_us
+
+# Best of a few runs, so one slow interpreter start does not fail the test
+REPEAT = 3
+
+class StartupTest(unittest.TestCase):
+    def test_import_fw_cli_within_budget(self):
+        best = None
+        for _ in range(REPEAT):
+            modules = import_profile("import fw.cli")
+            own = own_cost_us(modules, "fw.cli")
+            best = own if best is None else min(best, own)
+        self.assertLessEqual(best / 1000, DEFAULT_BUDGET_MS)
+
+    def test_command_specific_modules_are_deferred(self):
+        loaded = {name for name, _, _, _ in import_profile("import fw.cli")}
+        self.assertEqual([name for name in DEFERRED_MODULES if name in loaded], [])
+
+if __name__ == "__main__":
+    unittest.main()